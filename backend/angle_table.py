@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+
+
+class AngleTable:
+    # Default largest error of an interpolated orbital angle, in radians
+    DEFAULT_TOLERANCE: float = 1e-6
+    MIN_SIZE: int = 16
+    # Number of integration intervals per interval of the table
+    INTEGRATION_STEPS: int = 4
+
+    # (eccentricity, tolerance) -> table, each table is built on first use
+    _TABLES: dict[tuple[float, float], "AngleTable"] = {}
+
+    def __init__(self, eccentricity: float, tolerance: float = DEFAULT_TOLERANCE):
+        self.eccentricity = float(eccentricity)
+        self.tolerance = float(tolerance)
+        self.size = AngleTable.table_size(self.eccentricity, self.tolerance)
+
+        # Orbital angle at evenly spaced fractions of one orbit from aphelion, from 0 to 2 pi
+        self.angles = AngleTable.integrate_angles(self.eccentricity, self.size)
+        self._steps = np.diff(self.angles)
+
+    @staticmethod
+    def get(eccentricity: float, tolerance: float = DEFAULT_TOLERANCE) -> "AngleTable":
+        """
+        Retrieves the table of an orbit, building it if it has not been used before. A table only depends on the
+        eccentricity, as time is measured in orbits, so bodies with the same eccentricity share one table
+        """
+        key = (float(eccentricity), float(tolerance))
+        table = AngleTable._TABLES.get(key)
+        if table is None:
+            table = AngleTable(*key)
+            AngleTable._TABLES[key] = table
+        return table
+
+    @staticmethod
+    def table_size(eccentricity: float, tolerance: float) -> int:
+        """
+        Finds the number of entries for which linear interpolation between them is within the tolerance. The error
+        is at most h^2 / 8 * max|d2(theta)/d(tau)^2| for an interval h of tau, the time in orbits, and the second
+        derivative is bounded by 8 pi^2 e (1 + e)^3 / (1 - e^2)^3
+        """
+        e = eccentricity
+        max_curvature = 8 * math.pi ** 2 * e * (1 + e) ** 3 / (1 - e * e) ** 3
+        return max(math.ceil(math.sqrt(max_curvature / (8 * tolerance))) + 1, AngleTable.MIN_SIZE)
+
+    @staticmethod
+    def integrate_angles(eccentricity: float, size: int) -> np.ndarray:
+        """
+        Builds the angles of the table. Time is integrated over angle with Simpson's rule, using
+        dt/d(theta) = (1 - e^2)^(3/2) / (2 pi (1 - e cos(theta))^2) in orbits per radian, and the result is inverted by
+        interpolating onto evenly spaced times
+        :param eccentricity: eccentricity of the orbit
+        :param size: number of entries of the table
+        :return: array of orbital angles at the times np.linspace(0, 1, size)
+        """
+        e = eccentricity
+        num_steps = (size - 1) * AngleTable.INTEGRATION_STEPS
+        theta_vals = np.linspace(0, 2 * math.pi, 2 * num_steps + 1)
+        dt_dtheta = (1 - e * e) ** 1.5 / (2 * math.pi * (1 - e * np.cos(theta_vals)) ** 2)
+        step = 2 * math.pi / num_steps
+        intervals = step / 6 * (dt_dtheta[:-1:2] + 4 * dt_dtheta[1::2] + dt_dtheta[2::2])
+        time_vals = np.concatenate(([0], np.cumsum(intervals)))
+        # Removes the integration error of the whole orbit, so every orbit takes exactly one period
+        time_vals /= time_vals[-1]
+        return np.interp(np.linspace(0, 1, size), time_vals, theta_vals[::2])
+
+    def angles_at(self, orbits) -> np.ndarray:
+        """
+        Looks up the orbital angle at any number of orbits after aphelion in constant time per point, as the table
+        is evenly spaced in time
+        :param orbits: array of times in orbits, may span several orbits
+        :return: array of orbital angles, increasing continuously over several orbits
+        """
+        orbits = np.asarray(orbits, dtype=np.float64)
+        revolutions = np.floor(orbits)
+        position = (orbits - revolutions) * (self.size - 1)
+        index = np.minimum(position.astype(np.intp), self.size - 2)
+        return 2 * math.pi * revolutions + self.angles[index] + (position - index) * self._steps[index]
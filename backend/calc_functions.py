@@ -1,11 +1,40 @@
+import math
+from typing import Optional
+
 import numpy as np
-from backend.constants import Constants
+from backend.angle_table import AngleTable
+from backend.system_registry import SystemRegistry
+
+
+class CalculationCancelled(Exception):
+    """
+    Raised by a calculation that is cancelled before it finishes, for instance because the settings it was started
+    with have changed
+    """
+
 
 class CalcFunctions:
+    # Physical constants used for orbit statistics
+    EARTH_MASS: float = 5.972e24
+    AU_IN_METRES: float = 1.496e11
+    G: float = 6.67e-11
+    # Maximum drift in the phase of a body over one repeat of a pattern, as a fraction of its orbit, for the
+    # periods of two bodies to be treated as commensurate
+    PHASE_TOLERANCE: float = 0.01
+    # Most times the search for a repeat is narrowed before the motion is treated as not repeating
+    REPEAT_SEARCHES: int = 4
+    # "uniform" moves bodies through equal angles in equal times, "kepler" solves Kepler's equation so that bodies
+    # sweep out equal areas in equal times, "table" follows the same motion by interpolating precomputed angles
+    TIME_MODELS = ("uniform", "kepler", "table")
+    # Convergence bound of the solution of Kepler's equation in radians, and the most iterations used to reach it
+    KEPLER_TOLERANCE: float = 1e-12
+    KEPLER_MAX_ITERATIONS: int = 8
+
     @staticmethod
     def orbital_vals_2d(theta_vals, planet: str, solar_system: str):
-        b = float(Constants.__dict__[solar_system].SemiMinorAxis[planet].value)
-        e = float(Constants.__dict__[solar_system].Eccentricity[planet].value)
+        system = SystemRegistry.get(solar_system)
+        b = system.value("semi_minor_axis", planet)
+        e = system.value("eccentricity", planet)
         r = b / (1 - e * np.cos(theta_vals))
         x = r * np.cos(theta_vals)
         y = r * np.sin(theta_vals)
@@ -13,11 +42,297 @@ class CalcFunctions:
 
     @staticmethod
     def orbital_vals_3d(theta_vals, planet: str, solar_system: str):
-        b = float(Constants.__dict__[solar_system].SemiMinorAxis[planet].value)
-        e = float(Constants.__dict__[solar_system].Eccentricity[planet].value)
-        angle = float(Constants.__dict__[solar_system].InclinationAngle[planet].value)
+        system = SystemRegistry.get(solar_system)
+        b = system.value("semi_minor_axis", planet)
+        e = system.value("eccentricity", planet)
+        angle = system.value("inclination_angle", planet)
         r = b / (1 - e * np.cos(theta_vals))
         x = r * np.cos(theta_vals) * np.cos(angle)
         y = r * np.sin(theta_vals)
         z = r * np.cos(theta_vals) * np.sin(angle)
-        return (x, y, z)
\ No newline at end of file
+        return (x, y, z)
+
+    @staticmethod
+    def orbital_elements(planets: list[str], solar_system: str):
+        """
+        Gathers the orbital elements of several bodies into float arrays, in the order the bodies are given
+        :param planets: enum keys of the bodies
+        :param solar_system: enum key of the star system
+        :return: (semi-minor axes, eccentricities, orbital periods, inclination angles)
+        """
+        elements = SystemRegistry.get(solar_system).elements(planets)
+        return (elements["semi_minor_axis"].copy(),
+                elements["eccentricity"].copy(),
+                elements["orbital_period"].copy(),
+                elements["inclination_angle"].copy())
+
+    @staticmethod
+    def orbital_angles(time_vals, periods, eccentricity=None, time_model: str = "uniform") -> np.ndarray:
+        """
+        Calculates the orbital angle of every body at every point in time
+        :param time_vals: 1D array of points in time, in years
+        :param periods: 1D array of orbital periods, in years. Bodies with a period of 0 (the star) stay at angle 0
+        :param eccentricity: 1D array of eccentricities, only needed by the "kepler" and "table" time models
+        :param time_model: one of TIME_MODELS
+        :return: array of shape (n_bodies, n_times)
+        """
+        time_vals = np.asarray(time_vals, dtype=np.float64)
+        periods = np.asarray(periods, dtype=np.float64)
+        angular_freq = np.divide(2 * math.pi, periods, out=np.zeros_like(periods), where=periods != 0)
+        theta_vals = angular_freq[:, np.newaxis] * time_vals[np.newaxis, :]
+        if time_model == "uniform":
+            return theta_vals
+        if time_model == "kepler":
+            return CalcFunctions.kepler_angles(theta_vals, eccentricity)
+        if time_model == "table":
+            return CalcFunctions.table_angles(theta_vals, eccentricity)
+        raise ValueError(f"time model must be one of {CalcFunctions.TIME_MODELS}")
+
+    @staticmethod
+    def eccentric_anomaly(mean_anomaly, eccentricity, tolerance: float = KEPLER_TOLERANCE,
+                          max_iterations: int = KEPLER_MAX_ITERATIONS) -> np.ndarray:
+        """
+        Solves Kepler's equation M = E - e sin(E) for the eccentric anomaly E with Halley's method, iterating on
+        whole arrays at once until every solution has converged
+        :param mean_anomaly: array of mean anomalies M, in radians
+        :param eccentricity: eccentricities below 1, broadcast against the mean anomalies
+        :param tolerance: largest change in any solution at which iteration stops
+        :param max_iterations: most iterations done, 4 are enough for the tolerance at eccentricities up to 0.9
+        :return: array of eccentric anomalies, which are on the same revolution as their mean anomalies
+        """
+        mean_anomaly = np.asarray(mean_anomaly, dtype=np.float64)
+        e = np.asarray(eccentricity, dtype=np.float64)
+        # Reduces the mean anomalies to [-pi, pi], where |E - M| <= e
+        revolutions = np.round(mean_anomaly / (2 * math.pi))
+        m = mean_anomaly - 2 * math.pi * revolutions
+        # Starting guess of Danby, which is close enough for Halley's method to converge from at any eccentricity
+        ecc_anomaly = m + 0.85 * e * np.sign(m)
+        for _ in range(max_iterations):
+            e_sin = e * np.sin(ecc_anomaly)
+            e_cos = e * np.cos(ecc_anomaly)
+            f = ecc_anomaly - e_sin - m
+            df = 1 - e_cos
+            step = f / (df - 0.5 * f * e_sin / df)
+            ecc_anomaly -= step
+            if np.abs(step).max(initial=0) <= tolerance:
+                break
+        return ecc_anomaly + 2 * math.pi * revolutions
+
+    @staticmethod
+    def kepler_angles(uniform_angles, eccentricity) -> np.ndarray:
+        """
+        Converts orbital angles of uniform motion into the angles at the same points in time under Kepler's second
+        law. Orbits are at aphelion at angle 0, so the mean anomaly is the uniform angle plus pi, and the two angles
+        agree at aphelion and perihelion
+        :param uniform_angles: array of shape (n_bodies, n_times) of angles from uniform motion
+        :param eccentricity: 1D array of eccentricities
+        :return: array of shape (n_bodies, n_times), increasing continuously over several orbits like the input
+        """
+        e = np.asarray(eccentricity, dtype=np.float64)[:, np.newaxis]
+        ecc_anomaly = CalcFunctions.eccentric_anomaly(uniform_angles + math.pi, e)
+        sin_e = np.sin(ecc_anomaly)
+        cos_e = np.cos(ecc_anomaly)
+        # True anomaly minus mean anomaly, from E - M = e sin(E) and the half-angle relation between the true and
+        # eccentric anomalies, which stays continuous across revolutions
+        beta = e / (1 + np.sqrt(1 - e * e))
+        return uniform_angles + e * sin_e + 2 * np.arctan(beta * sin_e / (1 - beta * cos_e))
+
+    @staticmethod
+    def table_angles(uniform_angles, eccentricity, tolerance: float = AngleTable.DEFAULT_TOLERANCE) -> np.ndarray:
+        """
+        Converts orbital angles of uniform motion into the angles under Kepler's second law, looking them up in the
+        angle table of each body
+        :param uniform_angles: array of shape (n_bodies, n_times) of angles from uniform motion
+        :param eccentricity: 1D array of eccentricities
+        :param tolerance: largest error of the angles, in radians
+        :return: array of shape (n_bodies, n_times)
+        """
+        uniform_angles = np.asarray(uniform_angles, dtype=np.float64)
+        theta_vals = np.empty_like(uniform_angles)
+        for i, e in enumerate(eccentricity):
+            theta_vals[i] = AngleTable.get(e, tolerance).angles_at(uniform_angles[i] / (2 * math.pi))
+        return theta_vals
+
+    @staticmethod
+    def orbital_positions(theta_vals, semi_minor, eccentricity, inclination=None) -> np.ndarray:
+        """
+        Calculates the coordinates of every body from its orbital angles
+        :param theta_vals: array of shape (n_bodies, n_times) of orbital angles
+        :param semi_minor: 1D array of semi-minor axes
+        :param eccentricity: 1D array of eccentricities
+        :param inclination: 1D array of inclination angles, 3D coordinates are returned when given
+        :return: array of shape (n_bodies, n_times, 2) or (n_bodies, n_times, 3)
+        """
+        theta_vals = np.asarray(theta_vals, dtype=np.float64)
+        b = np.asarray(semi_minor, dtype=np.float64)[:, np.newaxis]
+        e = np.asarray(eccentricity, dtype=np.float64)[:, np.newaxis]
+        cos_theta = np.cos(theta_vals)
+        r = b / (1 - e * cos_theta)
+        dims = 2 if inclination is None else 3
+        positions = np.empty(theta_vals.shape + (dims,), dtype=np.float64)
+        r_cos = r * cos_theta
+        np.multiply(r, np.sin(theta_vals), out=positions[..., 1])
+        if inclination is None:
+            positions[..., 0] = r_cos
+        else:
+            angle = np.asarray(inclination, dtype=np.float64)[:, np.newaxis]
+            np.multiply(r_cos, np.cos(angle), out=positions[..., 0])
+            np.multiply(r_cos, np.sin(angle), out=positions[..., 2])
+        return positions
+
+    @staticmethod
+    def orbital_vals_batch(time_vals, semi_minor, eccentricity, periods, inclination=None,
+                           time_model: str = "uniform") -> np.ndarray:
+        """
+        Calculates the coordinates of many bodies over a shared time grid in a single vectorised pass
+        :param time_vals: 1D array of points in time, in years
+        :param semi_minor: 1D array of semi-minor axes
+        :param eccentricity: 1D array of eccentricities
+        :param periods: 1D array of orbital periods, in years
+        :param inclination: 1D array of inclination angles, 3D coordinates are returned when given
+        :param time_model: one of TIME_MODELS
+        :return: float64 array of shape (n_bodies, n_times, 2) or (n_bodies, n_times, 3)
+        """
+        theta_vals = CalcFunctions.orbital_angles(time_vals, periods, eccentricity, time_model)
+        return CalcFunctions.orbital_positions(theta_vals, semi_minor, eccentricity, inclination)
+
+    @staticmethod
+    def orbit_bounds(semi_minor, eccentricity, inclination=None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the smallest box holding the orbit of every body around the star. With the orbital angle measured from
+        aphelion, x runs from -p / (1 + e) at perihelion to p / (1 - e) at aphelion and y reaches p / sqrt(1 - e^2)
+        either side, for a semi-latus rectum p. The inclination scales the x range onto the x and z axes
+        :param semi_minor: 1D array of semi-minor axes
+        :param eccentricity: 1D array of eccentricities
+        :param inclination: 1D array of inclination angles, 3D boxes are returned when given
+        :return: lower and upper corners of every box, arrays of shape (n_bodies, 2) or (n_bodies, 3)
+        """
+        p = np.asarray(semi_minor, dtype=np.float64)
+        e = np.asarray(eccentricity, dtype=np.float64)
+        x = np.stack((-p / (1 + e), p / (1 - e)), axis=-1)
+        y = p / np.sqrt(1 - e ** 2)
+        if inclination is None:
+            return np.stack((x[:, 0], -y), axis=-1), np.stack((x[:, 1], y), axis=-1)
+        angle = np.asarray(inclination, dtype=np.float64)[:, np.newaxis]
+        x_range = x * np.cos(angle)
+        z_range = x * np.sin(angle)
+        lower = np.stack((x_range.min(axis=1), -y, z_range.min(axis=1)), axis=-1)
+        upper = np.stack((x_range.max(axis=1), y, z_range.max(axis=1)), axis=-1)
+        return lower, upper
+
+    @staticmethod
+    def relative_bounds(semi_minor, eccentricity, inclination=None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds a box holding the path of every body around the last body, the centre, without calculating any
+        positions. The offset of a body from the centre lies within the difference of their boxes around the star,
+        and no further from the centre than the sum of their aphelion distances. Around the star the box is exact
+        :param semi_minor: 1D array of semi-minor axes, the centre last
+        :param eccentricity: 1D array of eccentricities, the centre last
+        :param inclination: 1D array of inclination angles, the centre last, 3D boxes are returned when given
+        :return: lower and upper corners of the box, arrays of shape (2,) or (3,)
+        """
+        lower, upper = CalcFunctions.orbit_bounds(semi_minor, eccentricity, inclination)
+        aphelion = np.asarray(semi_minor, dtype=np.float64) / (1 - np.asarray(eccentricity, dtype=np.float64))
+        reach = (aphelion[:-1] + aphelion[-1])[:, np.newaxis]
+        body_lower = np.maximum(lower[:-1] - upper[-1], -reach)
+        body_upper = np.minimum(upper[:-1] - lower[-1], reach)
+        return body_lower.min(axis=0), body_upper.max(axis=0)
+
+    @staticmethod
+    def orbital_stats(theta_vals, semi_minor, semi_major, eccentricity, star_mass: float):
+        """
+        Calculates the orbital radius, linear velocity and angular velocity of every body at every orbital angle
+        :param theta_vals: array of shape (n_bodies, n_times) of orbital angles
+        :param semi_minor: 1D array of semi-minor axes in AU
+        :param semi_major: 1D array of semi-major axes in AU, bodies with a semi-major axis of 0 do not orbit
+        :param eccentricity: 1D array of eccentricities
+        :param star_mass: mass of the star in earth masses
+        :return: (distance from star in AU, linear velocity in m/s, angular velocity in rad/s), each of shape
+        (n_bodies, n_times)
+        """
+        theta_vals = np.asarray(theta_vals, dtype=np.float64)
+        b = np.asarray(semi_minor, dtype=np.float64)[:, np.newaxis]
+        a = np.asarray(semi_major, dtype=np.float64)[:, np.newaxis] * CalcFunctions.AU_IN_METRES
+        e = np.asarray(eccentricity, dtype=np.float64)[:, np.newaxis]
+        star_distance = b / (1 - e * np.cos(theta_vals))
+        linear_velocity = np.zeros_like(star_distance)
+        angular_velocity = np.zeros_like(star_distance)
+        orbiting = a[:, 0] != 0
+        r = star_distance[orbiting] * CalcFunctions.AU_IN_METRES
+        gm = CalcFunctions.G * star_mass * CalcFunctions.EARTH_MASS
+        linear_velocity[orbiting] = np.sqrt(gm * (2 / r - 1 / a[orbiting]))
+        angular_velocity[orbiting] = linear_velocity[orbiting] / r
+        return star_distance, linear_velocity, angular_velocity
+
+    @staticmethod
+    def convergent_denominators(x: float):
+        """
+        Generates the denominators of the continued fraction convergents of x, which are the integers k for which
+        k * x is closer to a whole number than for any smaller k
+        """
+        fraction = x - math.floor(x)
+        k_prev, k = 0, 1
+        yield k
+        while fraction > 1e-12:
+            x = 1 / fraction
+            a = math.floor(x)
+            fraction = x - a
+            k_prev, k = k, a * k + k_prev
+            yield k
+
+    @staticmethod
+    def repeat_period(periods, tolerance: float = PHASE_TOLERANCE, max_time: float = math.inf) -> Optional[float]:
+        """
+        Finds the shortest time after which every body is back at the same orbital angle, using rational
+        approximations of the ratios of the periods
+        :param periods: orbital periods, periods of 0 (the star) are ignored
+        :param tolerance: maximum drift in the phase of any body over one repeat, as a fraction of its orbit
+        :param max_time: longest repeat time searched for
+        :return: the repeat time, or None if the bodies do not repeat within max_time
+        """
+        periods = sorted(float(period) for period in periods if period > 0)
+        if not periods:
+            return None
+        repeat = periods[0]
+        for n, period in enumerate(periods[1:], start=1):
+            for k in CalcFunctions.convergent_denominators(repeat / period):
+                if repeat * k > max_time:
+                    return None
+                # Every body must complete at least one orbit, and the drift of every body so far is checked as
+                # multiplying the repeat time also multiplies their drift
+                orbits = [repeat * k / p for p in periods[:n + 1]]
+                if all(round(o) >= 1 and abs(o - round(o)) <= tolerance for o in orbits):
+                    repeat *= k
+                    break
+        return repeat
+
+    @staticmethod
+    def exact_repeat(periods, distances, span: float, tolerance: float) -> Optional[float]:
+        """
+        Finds the shortest time after which the motion of every body repeats closely enough to be reused over a span of
+        time. Each reuse of a repeat that is not exact adds the drift of every body over one repeat, so the drift over
+        every repeat in the span has to stay within the tolerance
+        :param periods: orbital periods, periods of 0 (the star) are ignored
+        :param distances: largest distance of every body from the star
+        :param span: time over which the motion is reused, a repeat is only searched for within half of it
+        :param tolerance: largest distance by which any body may end up from its true position
+        :return: the repeat time, or None if the motion does not repeat closely enough within half of the span
+        """
+        periods = np.asarray(periods, dtype=np.float64)
+        moving = periods > 0
+        reach = 2 * math.pi * float(np.sum(np.asarray(distances, dtype=np.float64)[moving]))
+        if not moving.any() or reach == 0:
+            return None
+        # Drift allowed over one repeat as a fraction of an orbit, tightened by the number of times the repeat is
+        # reused until the repeat found meets it
+        phase_tolerance = tolerance / reach
+        for _ in range(CalcFunctions.REPEAT_SEARCHES):
+            repeat = CalcFunctions.repeat_period(periods, phase_tolerance, max_time=span / 2)
+            if repeat is None:
+                return None
+            reuses = math.ceil(span / repeat) - 1
+            orbits = repeat / periods[moving]
+            if reuses * reach * float(np.max(np.abs(orbits - np.round(orbits)))) <= tolerance:
+                return repeat
+            phase_tolerance /= max(reuses, 2)
+        return None
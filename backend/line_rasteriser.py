@@ -0,0 +1,99 @@
+import math
+
+import numpy as np
+
+
+class LineRasteriser:
+    # Maximum number of samples splatted into the buffer at once, bounding temporary memory
+    MAX_SAMPLES_PER_BATCH: int = 2_000_000
+    TONE_MAPPINGS = ("log", "density")
+
+    def __init__(self, width: int, height: int, xlim: tuple[float, float], ylim: tuple[float, float]):
+        self.width = max(int(width), 1)
+        self.height = max(int(height), 1)
+        self.xlim = tuple(xlim)
+        self.ylim = tuple(ylim)
+
+        # Accumulated line coverage of every pixel, row 0 is the top of the image
+        self.buffer = np.zeros((self.height, self.width), dtype=np.float64)
+
+        # Scale from data coordinates to pixels
+        self._scale_x = self.width / (self.xlim[1] - self.xlim[0])
+        self._scale_y = self.height / (self.ylim[1] - self.ylim[0])
+
+    def clear(self):
+        self.buffer.fill(0)
+
+    def add_segments(self, segments: np.ndarray):
+        """
+        Accumulates anti-aliased line segments into the buffer. As in Wu's algorithm, each segment is sampled once
+        per pixel along its major axis and every sample is split between the two pixels nearest to it across that
+        axis, so the cost is proportional to the number of pixels the segments cross
+        :param segments: array of shape (n, 2, 2) of segment endpoints in data coordinates
+        :return: None, the buffer is modified in-place
+        """
+        segments = np.asarray(segments, dtype=np.float64)
+        if len(segments) == 0:
+            return
+        # Converts endpoints to continuous pixel coordinates, with pixel centres at half-integers
+        px = (segments[..., 0] - self.xlim[0]) * self._scale_x
+        py = (self.ylim[1] - segments[..., 1]) * self._scale_y
+        lengths = np.hypot(px[:, 1] - px[:, 0], py[:, 1] - py[:, 0])
+        major_lengths = np.maximum(np.abs(px[:, 1] - px[:, 0]), np.abs(py[:, 1] - py[:, 0]))
+        num_samples = np.ceil(major_lengths).astype(np.int64) + 1
+
+        # Splits the segments into batches so that the samples of one batch fit in MAX_SAMPLES_PER_BATCH
+        ends = np.cumsum(num_samples)
+        start = 0
+        while start < len(segments):
+            limit = (ends[start - 1] if start else 0) + LineRasteriser.MAX_SAMPLES_PER_BATCH
+            stop = max(int(np.searchsorted(ends, limit, side="right")), start + 1)
+            self._splat(px[start:stop], py[start:stop], lengths[start:stop], num_samples[start:stop])
+            start = stop
+
+    def _splat(self, px, py, lengths, num_samples):
+        segment_index = np.repeat(np.arange(len(num_samples)), num_samples)
+        first_sample = np.cumsum(num_samples) - num_samples
+        sample_index = np.arange(len(segment_index)) - np.repeat(first_sample, num_samples)
+        t = sample_index / np.maximum(num_samples - 1, 1)[segment_index]
+        x = px[segment_index, 0] + t * (px[segment_index, 1] - px[segment_index, 0]) - 0.5
+        y = py[segment_index, 0] + t * (py[segment_index, 1] - py[segment_index, 0]) - 0.5
+        # Every sample carries an equal share of its segment's length, so a line adds about 1 per pixel it crosses
+        weight = (np.maximum(lengths, 1) / num_samples)[segment_index]
+
+        steep = (np.abs(py[:, 1] - py[:, 0]) > np.abs(px[:, 1] - px[:, 0]))[segment_index]
+        major = np.floor(np.where(steep, y, x) + 0.5).astype(np.int64)
+        minor = np.where(steep, x, y)
+        minor_0 = np.floor(minor)
+        frac = minor - minor_0
+        minor_0 = minor_0.astype(np.int64)
+
+        indices = []
+        weights = []
+        for offset, pixel_weight in ((0, weight * (1 - frac)), (1, weight * frac)):
+            col = np.where(steep, minor_0 + offset, major)
+            row = np.where(steep, major, minor_0 + offset)
+            inside = (col >= 0) & (col < self.width) & (row >= 0) & (row < self.height)
+            indices.append(row[inside] * self.width + col[inside])
+            weights.append(pixel_weight[inside])
+        coverage = np.bincount(np.concatenate(indices), weights=np.concatenate(weights),
+                               minlength=self.width * self.height)
+        self.buffer += coverage.reshape(self.buffer.shape)
+
+    def tone_map(self, mode: str = "log", exposure: float = 1.0) -> np.ndarray:
+        """
+        Maps the accumulated coverage to intensities for display
+        :param mode: "density" scales linearly with coverage, "log" compresses dense regions so sparse lines remain
+        visible
+        :param exposure: coverage that maps to full intensity in "density" mode, or the strength of the compression
+        in "log" mode
+        :return: array of the same shape as the buffer with values between 0 and 1
+        """
+        if mode == "density":
+            return np.clip(self.buffer / exposure, 0, 1)
+        if mode == "log":
+            peak = float(self.buffer.max())
+            if peak == 0:
+                return np.zeros_like(self.buffer)
+            return np.minimum(np.log1p(self.buffer * exposure) / math.log1p(peak * exposure), 1)
+        raise ValueError(f"tone mapping must be one of {LineRasteriser.TONE_MAPPINGS}")
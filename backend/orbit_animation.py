@@ -0,0 +1,740 @@
+import threading
+from typing import Callable, Optional
+
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from matplotlib.backend_bases import ResizeEvent
+from random import shuffle
+import numpy as np
+from backend.constants import Constants
+from backend.calc_functions import CalcFunctions, CalculationCancelled
+from backend.system_registry import SystemRegistry
+from backend.trajectory_cache import TrajectoryCache, TRAJECTORY_CACHE
+from backend.orbit_paths import OrbitPaths
+from backend.path_resampler import PathResampler
+from backend.parallel_trajectories import ParallelTrajectories, PARALLEL_TRAJECTORIES
+from backend.trajectory_store import TrajectoryStore, TRAJECTORY_STORE
+
+
+class OrbitAnimation:
+    """
+    Animation of the orbits of planets around a centre, shared by Animation2D and Animation3D. It calculates, caches,
+    stores and streams the trajectories and runs the animation, while the subclasses create the axes and artists of
+    their projection
+    """
+    # Number of coordinates of every position, and the view type trajectories are cached under
+    DIMS: int = 2
+    VIEW_TYPE: str = "2D"
+    FRAME_DURATION = 20
+    COLOURS = ["black", "orange", "green", "blue", "darkviolet", "cyan", "lime", "pink", "indigo"]
+    # Colormap that colours are taken from when there are more planets than COLOURS
+    COLOURMAP = "gist_rainbow"
+    # "collection" draws every planet with a single scatter artist, "lines" draws one line artist per planet
+    RENDER_MODES = ("collection", "lines")
+    # "precompute" calculates every frame before the animation starts, "stream" calculates frames a chunk at a time
+    # as they are shown so that memory use does not grow with the length of the animation
+    FRAME_MODES = ("precompute", "stream")
+    # Number of frames calculated at once in "stream" frame mode
+    STREAM_CHUNK = 512
+    # Orbit statistics calculated for every planet at every frame
+    STAT_NAMES = ("orbital_angle", "star_distance", "linear_velocity", "angular_velocity", "centre_distance")
+    # Values held for every planet at every frame, in the order of the last axis of the frame data
+    FRAME_FIELDS = ("x", "y") + ("theta",) + STAT_NAMES
+    # Data types that trajectories can be stored in, calculations are always done in float64
+    PRECISIONS = ("float64", "float32")
+    # Largest distance, as a fraction of the furthest distance of any body from the star, by which a body may end up
+    # from its true position when the frames of one repeat of the motion are reused for the rest of the animation
+    REPEAT_TOLERANCE: float = 1e-5
+    # Attributes left out when the animation is pickled, as copies of the animation in worker processes only need its
+    # settings and orbital elements to calculate trajectories
+    UNPICKLED_ATTRIBUTES = ("_fig", "_ax", "ani", "_lines", "_anims", "_bodies", "post_draw_callback",
+                            "progress_callback", "cancel_event", "_cache", "_store", "_parallel", "_resampler",
+                            "_frame_data", "_anim_data", "_theta_vals", "_stats")
+
+    def __init__(self, fig, solar_system: str, planets: list[str], centre: str, orbit_duration: float, num_orbits: int,
+                 post_draw_callback: Optional[Callable] = None, render_mode: str = "collection",
+                 cache: Optional[TrajectoryCache] = TRAJECTORY_CACHE,
+                 store: Optional[TrajectoryStore] = TRAJECTORY_STORE, frame_mode: str = "precompute",
+                 precision: str = "float64", time_model: str = "uniform",
+                 progress_callback: Optional[Callable[[float], None]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 parallel: Optional[ParallelTrajectories] = PARALLEL_TRAJECTORIES):
+        if render_mode not in OrbitAnimation.RENDER_MODES:
+            raise ValueError(f"render mode must be one of {OrbitAnimation.RENDER_MODES}")
+        if frame_mode not in OrbitAnimation.FRAME_MODES:
+            raise ValueError(f"frame mode must be one of {OrbitAnimation.FRAME_MODES}")
+        if precision not in OrbitAnimation.PRECISIONS:
+            raise ValueError(f"precision must be one of {OrbitAnimation.PRECISIONS}")
+        if time_model not in CalcFunctions.TIME_MODELS:
+            raise ValueError(f"time model must be one of {CalcFunctions.TIME_MODELS}")
+        self._solar_system = solar_system
+        self.post_draw_callback = post_draw_callback
+        # Called with the fraction of the trajectories calculated so far, and checked to stop the calculation early,
+        # while the constructor calculates the trajectories, which may be away from the GUI thread
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self._cache = cache
+        self._store = store
+        self._parallel = parallel
+        self.constants = Constants.__dict__[self._solar_system]
+
+        # Total number of orbits of outermost planet
+        self._num_orbits = num_orbits
+
+        # Planets to show in animation
+        self._planets = planets
+
+        # Total number of frames for one orbit of outermost planet
+        self._num_frames = None
+
+        # Number of frames held in the frame data, which is one repeat of the motion when the motion repeats within
+        # the animation, as later frames are the same as the frames of the first repeat
+        self._cycle_frames = None
+
+        # Time in years between two consecutive frames
+        self._frame_step = None
+
+        # Total number of samples of the orbital paths
+        self._num_samples = None
+
+        # Line objects for orbital paths
+        self._lines = []
+
+        # Point objects for planet position, used in "lines" render mode
+        self._anims = []
+
+        # Single scatter artist for the positions of all planets, used in "collection" render mode
+        self._bodies = None
+        self._render_mode = render_mode
+        self._frame_mode = frame_mode
+        self._precision = precision
+        self._time_model = time_model
+        self._dtype = np.dtype(precision)
+
+        # Coordinates, orbital angle and orbit statistics of every planet at every frame, in one contiguous array of
+        # shape (frames, planets, fields) so that the data of a frame is stored together
+        self._frame_data = None
+
+        # Views into the frame data: coordinates of shape (frames, planets, DIMS), orbital angles of shape
+        # (frames, planets) and orbit statistics of shape (frames, planets)
+        self._anim_data = None
+        self._theta_vals = None
+        self._stats = {}
+
+        # Index of the first frame held in the frame data, which only holds the current chunk of frames in "stream"
+        # frame mode
+        self._chunk_start = 0
+
+        # Frame that the animation jumps to when it draws its next frame, set by seek
+        self._seek_frame = None
+
+        # Index of the frame drawn most recently
+        self._frame = 0
+
+        # Name of planet at centre of animation
+        self._centre = centre
+
+        # Orbital elements of every planet followed by the centre
+        self._semi_minor = None
+        self._eccentricity = None
+        self._periods = None
+        self._inclination = None
+        self._max_period = None
+
+        # Duration of outermost orbit in seconds
+        self._orbit_duration = orbit_duration / 2
+
+        self.colours = OrbitAnimation.pick_colours(len(self._planets))
+
+        self._fig: Optional[plt.Figure] = None
+        self._ax = None
+        self.ani = None
+
+        # Resamples the orbital paths in the background when the axes are zoomed or panned, on axes that support it
+        self._resampler: Optional[PathResampler] = None
+
+        self.load_orbital_elements()
+        self.load_trajectories()
+        self.progress_callback = None
+        self.cancel_event = None
+        if fig is not None:
+            self.attach(fig)
+
+    def attach(self, fig: plt.Figure):
+        """
+        Creates the axes and artists of the animation on a figure and starts it. An animation created without a
+        figure only calculates its trajectories, which lets them be calculated away from the GUI thread, and is
+        attached to a figure on the GUI thread once they are ready
+        :param fig: figure to draw the animation on
+        :return: None
+        """
+        self._fig = fig
+        self._ax = self.create_axes()
+        self.set_limits()
+        self.create_animation()
+
+    def create_axes(self):
+        raise NotImplementedError
+
+    def cache_key(self) -> tuple:
+        return TrajectoryCache.make_key(self._solar_system, self._planets, self._centre, self._orbit_duration,
+                                        self._num_orbits, self.VIEW_TYPE, self._precision, self._time_model)
+
+    def trajectory_data(self) -> dict[str, np.ndarray]:
+        return {"frame_data": self._frame_data}
+
+    def trajectory_shapes(self) -> dict[str, tuple]:
+        num_planets = len(self._planets)
+        return {"frame_data": (self._cycle_frames, num_planets, len(self.FRAME_FIELDS))}
+
+    def trajectory_nbytes(self) -> int:
+        return sum(self._dtype.itemsize * int(np.prod(shape)) for shape in self.trajectory_shapes().values())
+
+    def count_samples(self):
+        """
+        Calculates the total number of frames that will make up the animation and the time between them. When the
+        motion of every body repeats within the animation, the frames are spaced so that one repeat is a whole number
+        of frames and only the frames of the first repeat are calculated
+        :return: None
+        """
+        self._num_frames = round((self._orbit_duration * 1000 * self._num_orbits) / self.FRAME_DURATION)
+        self._frame_step = self.time_step(self._num_frames)
+        self._cycle_frames = self._num_frames
+        distances = self._semi_minor / (1 - self._eccentricity)
+        repeat = CalcFunctions.exact_repeat(self._periods, distances, self.total_time(),
+                                            self.REPEAT_TOLERANCE * float(distances.max()))
+        if repeat is not None:
+            self._cycle_frames = max(round(repeat / self._frame_step), 1)
+            self._frame_step = repeat / self._cycle_frames
+            self._num_frames = round(self.total_time() / self._frame_step) + 1
+
+    def load_trajectories(self):
+        """
+        Loads the orbital paths, then takes the frame data and statistics from the trajectory cache, or calculates and
+        caches them if they are not cached. Trajectories too large to keep in memory are written to the trajectory store
+        instead and read back from disk frame by frame
+        :return: None
+        """
+        self.count_samples()
+        self.load_paths()
+        if self._frame_mode == "stream":
+            self.load_chunk(0)
+            return
+
+        key = self.cache_key()
+        data = self._cache.get(key) if self._cache is not None else None
+        if data is None and self._store is not None and self.trajectory_nbytes() >= self._store.min_bytes:
+            data = self._store.load(key, self.trajectory_shapes(), self._dtype)
+            if data is None:
+                data = self._store.save(key, self.trajectory_shapes(), self.fill_trajectories, self._dtype)
+        if data is None:
+            data = {name: np.empty(shape, dtype=self._dtype) for name, shape in self.trajectory_shapes().items()}
+            self.fill_trajectories(data)
+            if self._cache is not None:
+                self._cache.put(key, data)
+        self.set_frame_data(data["frame_data"])
+
+    def fill_trajectories(self, arrays: dict[str, np.ndarray]):
+        """
+        Calculates the frames a chunk at a time, writing each chunk into the given arrays. Large jobs are split
+        between the worker processes of the parallel backend
+        :param arrays: arrays of the shapes given by trajectory_shapes
+        :return: None
+        """
+        if self._parallel is not None and self._parallel.is_worthwhile(self._cycle_frames, len(self._planets)):
+            self._parallel.fill(self, arrays)
+            return
+        chunk_size = TrajectoryStore.CHUNK_SIZE
+        self.report_progress(0, self._cycle_frames)
+        for start in range(0, self._cycle_frames, chunk_size):
+            stop = min(start + chunk_size, self._cycle_frames)
+            self.calculate_frames(start, stop, arrays["frame_data"][start:stop])
+            self.report_progress(stop, self._cycle_frames)
+
+    def select_planets(self, start: int, stop: int):
+        """
+        Restricts the animation to a range of its planets, keeping the time base set by every planet, so that groups
+        of planets can be calculated separately by copies of the animation
+        :param start: index of the first planet kept
+        :param stop: index after the last planet kept
+        :return: None
+        """
+        bodies = np.r_[start:stop, len(self._planets)]
+        self._planets = self._planets[start:stop]
+        self._semi_minor = self._semi_minor[bodies]
+        self._eccentricity = self._eccentricity[bodies]
+        self._periods = self._periods[bodies]
+        self._inclination = self._inclination[bodies]
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        for name in OrbitAnimation.UNPICKLED_ATTRIBUTES:
+            state[name] = None
+        return state
+
+    def report_progress(self, done: int, total: int):
+        """
+        Passes the progress of the calculation to the progress callback, and stops the calculation by raising
+        CalculationCancelled once the cancel event is set
+        :param done: number of samples and frames calculated
+        :param total: total number of samples and frames
+        :return: None
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise CalculationCancelled()
+        if self.progress_callback is not None:
+            self.progress_callback(done / max(total, 1))
+
+    @staticmethod
+    def pick_colours(num_colours: int) -> list:
+        if num_colours <= len(OrbitAnimation.COLOURS):
+            colours = OrbitAnimation.COLOURS.copy()
+            shuffle(colours)
+            return colours
+        # Evenly spaced colours from a colormap, so that any number of planets can be told apart
+        return list(matplotlib.colormaps[OrbitAnimation.COLOURMAP](np.linspace(0, 1, num_colours, endpoint=False)))
+
+    def load_orbital_elements(self):
+        # Bodies in the animation followed by the centre, whose coordinates are subtracted from every other body
+        bodies = self._planets + [self._centre]
+        semi_minor, eccentricity, periods, inclination = CalcFunctions.orbital_elements(bodies, self._solar_system)
+        # The star is drawn at the position of the centre, so it takes on the orbital angle of the centre
+        for i, planet in enumerate(self._planets):
+            if planet == self.constants.SUN:
+                periods[i] = periods[-1]
+        self._semi_minor = semi_minor
+        self._eccentricity = eccentricity
+        self._periods = periods
+        self._inclination = inclination
+        self._max_period = float(periods[:-1].max())
+
+    def inclination(self) -> Optional[np.ndarray]:
+        # Inclination angles used to place the orbits, None for orbits drawn in the plane
+        return None
+
+    def orbital_angles(self, time_vals) -> np.ndarray:
+        return CalcFunctions.orbital_angles(time_vals, self._periods, self._eccentricity, self._time_model)
+
+    def relative_positions(self, theta_vals):
+        positions = CalcFunctions.orbital_positions(theta_vals, self._semi_minor, self._eccentricity,
+                                                    self.inclination())
+        # Subtracts coordinates of reference planet at each corresponding point in time
+        return positions[:-1] - positions[-1]
+
+    def time_step(self, num_points: int) -> float:
+        # Interval between points spread evenly over the whole animation, the first at 0 and the last at the end
+        return self._max_period * self._num_orbits / max(num_points - 1, 1)
+
+    def closed_paths(self) -> bool:
+        # Around the star, which does not move, the path of every planet is a closed ellipse
+        return self._semi_minor[-1] == 0
+
+    def load_paths(self):
+        """
+        Samples the orbital path of every planet, unless OrbitPaths already keeps it. Around the star each path is a
+        single closed orbit, around a planet each path covers the whole animation and is sampled adaptively. Paths
+        are kept by OrbitPaths and shared by every animation, rather than copied into the animation
+        :return: None
+        """
+        self._num_samples = sum(len(self.path_samples(i)[3]) for i in range(len(self._planets)))
+
+    def path_samples(self, i: int) -> tuple:
+        # Samples of the orbital path of a planet, as kept by OrbitPaths
+        if self.closed_paths():
+            return OrbitPaths.closed_samples(self._solar_system, self._planets[i], self.DIMS)
+        return OrbitPaths.relative_samples(self._solar_system, self._planets[i], self._centre,
+                                           self._max_period * self._num_orbits, self._time_model, self.DIMS)
+
+    def display_path(self, i: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def set_limits(self):
+        raise NotImplementedError
+
+    def calculate_frames(self, start: int, stop: int, out: np.ndarray):
+        """
+        Calculates the coordinates, orbital angles and orbit statistics of every planet over a range of frames
+        :param start: index of the first frame
+        :param stop: index after the last frame
+        :param out: array of shape (stop - start, planets, fields) that the frames are written to
+        :return: None
+        """
+        self.calculate_times(np.arange(start, stop) * self._frame_step, out)
+
+    def calculate_times(self, time_vals, out: np.ndarray):
+        """
+        Calculates the coordinates, orbital angles and orbit statistics of every planet at any points in time. Every
+        position is evaluated in closed form, so the cost does not depend on how far into the animation the times are
+        :param time_vals: 1D array of points in time, in years
+        :param out: array of shape (len(time_vals), planets, fields) that the values are written to
+        :return: None
+        """
+        # Calculates orbital angles at corresponding points in time
+        theta_vals = self.orbital_angles(time_vals)
+        anim_data = self.relative_positions(theta_vals)
+        theta_vals = theta_vals[:-1]
+        out[..., :self.DIMS] = anim_data.transpose(1, 0, 2)
+        out[..., self.DIMS] = theta_vals.T
+        for name, vals in self.calculate_stats(theta_vals, anim_data).items():
+            out[..., self.FRAME_FIELDS.index(name)] = vals.T
+
+    def new_frame_data(self, num_frames: int) -> np.ndarray:
+        return np.empty((num_frames, len(self._planets), len(self.FRAME_FIELDS)), dtype=self._dtype)
+
+    def set_frame_data(self, frame_data: np.ndarray):
+        self._frame_data = frame_data
+        self._anim_data = frame_data[..., :self.DIMS]
+        self._theta_vals = frame_data[..., self.DIMS]
+        self._stats = {name: frame_data[..., self.FRAME_FIELDS.index(name)] for name in self.STAT_NAMES}
+
+    def calculate_stats(self, theta_vals, anim_data) -> dict[str, np.ndarray]:
+        system = SystemRegistry.get(self._solar_system)
+        star_distance, linear_velocity, angular_velocity = CalcFunctions.orbital_stats(
+            theta_vals,
+            self._semi_minor[:-1],
+            system.field("semi_major_axis", self._planets),
+            self._eccentricity[:-1],
+            system.value("mass", self.constants.SUN))
+        return {
+            "orbital_angle": theta_vals % (2 * np.pi),
+            "star_distance": star_distance,
+            "linear_velocity": linear_velocity,
+            "angular_velocity": angular_velocity,
+            "centre_distance": np.linalg.norm(anim_data, axis=-1),
+        }
+
+    def load_chunk(self, start: int):
+        stop = min(start + self.STREAM_CHUNK, self._cycle_frames)
+        frame_data = self.new_frame_data(stop - start)
+        self.calculate_frames(start, stop, frame_data)
+        self.set_frame_data(frame_data)
+        self._chunk_start = start
+
+    def frame_index(self, i: int) -> int:
+        """
+        Finds where a frame is held in the frame data, calculating the chunk of frames that holds it if it is not in
+        memory. Frames after the first repeat of the motion are taken from the same point of the first repeat
+        :param i: index of the frame in the animation
+        :return: index of the frame in the frame data
+        """
+        i %= self._cycle_frames
+        if self._frame_mode == "precompute":
+            return i
+        if not self._chunk_start <= i < self._chunk_start + len(self._frame_data):
+            self.load_chunk(i - i % self.STREAM_CHUNK)
+        return i - self._chunk_start
+
+    def total_time(self) -> float:
+        # Time in years at the last frame of the animation
+        return self._max_period * self._num_orbits
+
+    def time_at(self, i: int) -> float:
+        return i * self._frame_step
+
+    def frame_at(self, time: float) -> int:
+        return min(max(round(time / self._frame_step), 0), self._num_frames - 1)
+
+    def state_at(self, time: float) -> dict[str, np.ndarray]:
+        """
+        Evaluates the coordinates and orbit statistics of every planet at any point in time, which does not have to
+        fall on a frame
+        :param time: time in years since the start of the animation
+        :return: dictionary in the same form as get_frame_stats
+        """
+        frame_data = self.new_frame_data(1)
+        self.calculate_times(np.array([time]), frame_data)
+        state = {name: frame_data[0, :, self.FRAME_FIELDS.index(name)] for name in self.STAT_NAMES}
+        state["coordinates"] = frame_data[0, :, :self.DIMS]
+        state["time"] = float(time)
+        return state
+
+    def seek(self, time: float):
+        """
+        Makes the animation continue from the frame nearest to a point in time. Only that frame has to be available,
+        so seeking costs at most one chunk of frames in "stream" frame mode and nothing otherwise
+        :param time: time in years since the start of the animation
+        :return: None
+        """
+        self._seek_frame = self.frame_at(time)
+        self.frame_index(self._seek_frame)
+
+    def frame_sequence(self):
+        """
+        Generates the index of every frame in order, jumping to the frame set by seek whenever it is called. In
+        "stream" frame mode, each chunk of frames is calculated when its first frame is reached
+        """
+        i = 0
+        while i < self._num_frames:
+            if self._seek_frame is not None:
+                i, self._seek_frame = self._seek_frame, None
+            yield i
+            i += 1
+
+    def get_frame_stats(self, i) -> dict[str, np.ndarray]:
+        """
+        Retrieves the coordinates and orbit statistics of every planet at a frame
+        :param i: index of the frame
+        :return: dictionary of statistic name to array with one value (or coordinate row) per planet, and the time of
+        the frame in years
+        """
+        j = self.frame_index(i)
+        frame_stats = {name: vals[j] for name, vals in self._stats.items()}
+        frame_stats["coordinates"] = self._anim_data[j]
+        frame_stats["time"] = self.time_at(i)
+        return frame_stats
+
+    def plot_line(self, points: np.ndarray, **kwargs):
+        raise NotImplementedError
+
+    def set_line_data(self, line, points: np.ndarray):
+        raise NotImplementedError
+
+    def scatter_bodies(self, points: np.ndarray):
+        raise NotImplementedError
+
+    def set_body_positions(self, points: np.ndarray):
+        raise NotImplementedError
+
+    def show_legend(self):
+        raise NotImplementedError
+
+    def init_func(self):
+        # Only the planet positions are returned, so the orbital paths are drawn once into the blitting background
+        if self._render_mode == "collection":
+            self.set_body_positions(np.empty((0, self.DIMS)))
+            return [self._bodies]
+        for marker in self._anims:
+            self.set_line_data(marker, np.empty((0, self.DIMS)))
+        return self._anims
+
+    def animate(self, i):
+        self._frame = i
+        # The frame is located first, as in "stream" frame mode this can load the chunk that holds it
+        k = self.frame_index(i)
+        coords = self._anim_data[k]
+        if self._render_mode == "collection":
+            self.set_body_positions(coords)
+            artists = [self._bodies]
+        else:
+            for j, marker in enumerate(self._anims):
+                self.set_line_data(marker, coords[j:j + 1])
+            artists = self._anims
+        if self.post_draw_callback:
+            self.post_draw_callback(self.get_frame_stats(i))
+        return artists
+
+    def create_path(self, i: int):
+        return self.plot_line(self.display_path(i), lw=2, label=self._planets[i], color=self.colours[i])
+
+    def create_marker(self, i: int):
+        return self.plot_line(np.empty((0, self.DIMS)), color=self.colours[i], marker="o")
+
+    def set_path_data(self, path, i: int):
+        self.set_line_data(path, self.display_path(i))
+
+    def reassign_colours(self, old_planets: list[str]):
+        # Planets that are still shown keep their colour, and new planets take colours that are no longer in use
+        old_colours = dict(zip(old_planets, self.colours))
+        free = [old_colours[planet] for planet in old_planets if planet not in self._planets]
+        free += self.colours[len(old_planets):]
+        if len([planet for planet in self._planets if planet not in old_colours]) > len(free):
+            self.colours = OrbitAnimation.pick_colours(len(self._planets))
+            return
+        free = iter(free)
+        colours = [old_colours[planet] if planet in old_colours else next(free) for planet in self._planets]
+        self.colours = colours + list(free)
+
+    def update_artists(self, old_planets: list[str]):
+        """
+        Matches the artists to the planets shown, removing the artists of planets no longer shown, updating those of
+        planets still shown and creating artists for new planets
+        :param old_planets: planets shown before the change
+        :return: None
+        """
+        old_paths = dict(zip(old_planets, self._lines[1:]))
+        old_markers = dict(zip(old_planets, self._anims))
+        for planet in old_planets:
+            if planet not in self._planets:
+                old_paths.pop(planet).remove()
+                if planet in old_markers:
+                    old_markers.pop(planet).remove()
+        self._lines = self._lines[:1]
+        self._anims = []
+        for i, planet in enumerate(self._planets):
+            path = old_paths.get(planet)
+            if path is None:
+                path = self.create_path(i)
+            else:
+                self.set_path_data(path, i)
+                path.set_color(self.colours[i])
+            self._lines.append(path)
+            if self._render_mode == "lines":
+                marker = old_markers.get(planet)
+                if marker is None:
+                    marker = self.create_marker(i)
+                    marker.set_animated(True)
+                marker.set_color(self.colours[i])
+                self._anims.append(marker)
+        if self._render_mode == "collection":
+            self.set_body_positions(self._anim_data[0])
+            self._bodies.set_facecolor(self.colours[:len(self._planets)])
+            self._bodies.set_edgecolor(self.colours[:len(self._planets)])
+        self.show_legend()
+
+    def apply_settings(self, planets: list[str], orbit_duration: float, num_orbits: int):
+        """
+        Sets the planets shown, orbit time and number of orbits, and the orbital elements and time base that follow
+        from them, without loading any trajectories
+        :param planets: planets to show in animation
+        :param orbit_duration: duration of outermost orbit in seconds
+        :param num_orbits: total number of orbits of outermost planet
+        :return: None
+        """
+        self._planets = list(planets)
+        self._orbit_duration = orbit_duration / 2
+        self._num_orbits = num_orbits
+        self.load_orbital_elements()
+        # The frames are spaced by the repeat of the motion, which can change with the planets shown
+        self.count_samples()
+
+    def classify_settings(self, planets: list[str], orbit_duration: float, num_orbits: int) -> str:
+        """
+        Tells how update_settings would apply new settings without a calculated animation, leaving the animation
+        unchanged, so that the trajectories are only calculated away from the GUI thread when they are needed
+        :param planets: planets to show in animation
+        :param orbit_duration: duration of outermost orbit in seconds
+        :param num_orbits: total number of orbits of outermost planet
+        :return: "cached" when the trajectory cache holds the trajectories, "removed" when planets were only removed,
+        which leaves the time base and the data of the planets still shown unchanged, and "calculate" otherwise
+        """
+        # The new time base is worked out on a shallow copy, which shares the arrays and the trajectory cache
+        probe = object.__new__(type(self))
+        probe.__dict__.update(self.__dict__)
+        probe.apply_settings(planets, orbit_duration, num_orbits)
+        if self._frame_mode == "precompute" and self._cache is not None and probe.cache_key() in self._cache:
+            return "cached"
+        same_time_base = (probe._num_orbits, probe._orbit_duration, probe._max_period) == \
+            (self._num_orbits, self._orbit_duration, self._max_period) and \
+            (probe._num_frames, probe._cycle_frames, probe._frame_step) == \
+            (self._num_frames, self._cycle_frames, self._frame_step)
+        only_removed = all(planet in self._planets for planet in planets)
+        # Trajectories on disk are reloaded from the store rather than copied into memory
+        in_memory = self._frame_data is not None and not isinstance(self._frame_data, np.memmap)
+        return "removed" if same_time_base and only_removed and in_memory else "calculate"
+
+    def update_settings(self, planets: list[str], orbit_duration: float, num_orbits: int, calculated=None):
+        """
+        Applies new settings to the running animation, reusing its axes and the artists of planets still shown. The
+        trajectories are taken from an animation already calculated with the new settings when one is given, so the
+        GUI thread never calculates them. Otherwise removing planets only drops their data, and other changes load
+        the trajectories from the cache or the store, calculating them only when neither holds them, see
+        classify_settings. The animation then carries on from the same point in time
+        :param planets: planets to show in animation
+        :param orbit_duration: duration of outermost orbit in seconds
+        :param num_orbits: total number of orbits of outermost planet
+        :param calculated: animation created without a figure with the new settings, or None
+        :return: None
+        """
+        time = self.time_at(self._frame)
+        old_planets = self._planets
+        change = self.classify_settings(planets, orbit_duration, num_orbits) if calculated is None else None
+        self.apply_settings(planets, orbit_duration, num_orbits)
+
+        if calculated is not None:
+            # The trajectories were calculated away from the GUI thread
+            self.adopt_trajectories(calculated)
+        elif change == "removed":
+            # Planets were only removed, which does not change the data of the planets still shown
+            self.load_paths()
+            self.set_frame_data(self._frame_data[:, [old_planets.index(planet) for planet in self._planets]])
+            if self._cache is not None and self._frame_mode == "precompute":
+                self._cache.put(self.cache_key(), self.trajectory_data())
+        else:
+            # The trajectories are cached, for instance by an animation created in the background, or else calculated
+            self.load_trajectories()
+
+        # The limits are set first, as the paths are decimated to the pixel size of the axes
+        self.set_limits()
+        self.reassign_colours(old_planets)
+        self.update_artists(old_planets)
+        self.seek(min(time, self.total_time()))
+        self.redraw_background()
+        if self._resampler is not None:
+            self._resampler.mark_drawn()
+
+    def adopt_trajectories(self, calculated):
+        """
+        Takes the frames of an animation calculated with the same settings, sharing its arrays
+        :param calculated: animation created without a figure
+        :return: None
+        """
+        self._num_frames = calculated._num_frames
+        self._cycle_frames = calculated._cycle_frames
+        self._frame_step = calculated._frame_step
+        self._chunk_start = calculated._chunk_start
+        self.load_paths()
+        self.set_frame_data(calculated._frame_data)
+
+    def redraw_background(self):
+        # The orbital paths are drawn into the blitting background, which the animation saves for each view of the axes. A
+        # resize event makes it discard the saved background, and the full redraw that follows saves a new one
+        canvas = self._fig.canvas
+        canvas.callbacks.process("resize_event", ResizeEvent("resize_event", canvas))
+        canvas.draw()
+
+    def stop(self):
+        # Pauses the animation and removes the callbacks of its timer, so that a canvas that is reused for another
+        # animation cannot make it draw again. Nothing else then refers to the animation, and as the canvas only keeps
+        # weak references to its event handlers, they are disconnected once it is released
+        if self.ani is not None and self.ani.event_source is not None:
+            self.ani.pause()
+            self.ani.event_source.callbacks.clear()
+
+    def dispose(self):
+        """
+        Stops the animation and releases its artists, axes and trajectory data, so that nothing the animation created
+        is kept alive by the figure or the canvas. The animation cannot be used afterwards
+        :return: None
+        """
+        self.stop()
+        self.ani = None
+        self.post_draw_callback = None
+        if self._resampler is not None:
+            self._resampler.dispose()
+            self._resampler = None
+        if self._fig is not None and self._ax in self._fig.axes:
+            self._fig.delaxes(self._ax)
+        self._lines = []
+        self._anims = []
+        self._bodies = None
+        self._frame_data = None
+        self._anim_data = None
+        self._theta_vals = None
+        self._stats = {}
+
+    def create_animation(self):
+        # The centre is drawn at the origin, in yellow when it is the star
+        colour = "yellow" if self._centre == self.constants.SUN else "red"
+        self._lines.append(self.plot_line(np.zeros((1, self.DIMS)), color=colour, marker="o", lw=2, markersize=10,
+                                          label=self._centre))
+
+        # Initialises line objects for orbital paths and points
+        if self._render_mode == "collection":
+            self._bodies = self.scatter_bodies(self._anim_data[0])
+        for i in range(len(self._planets)):
+            if self._render_mode == "lines":
+                self._anims.append(self.create_marker(i))
+            self._lines.append(self.create_path(i))
+        self.show_legend()
+
+        # Frames are produced by a generator so that the animation can seek, and they are not kept after they are shown
+        self.ani = FuncAnimation(self._fig,
+                                 self.animate,
+                                 frames=self.frame_sequence,
+                                 save_count=self._num_frames,
+                                 cache_frame_data=False,
+                                 interval=self.FRAME_DURATION,
+                                 repeat=True,
+                                 blit=True,
+                                 init_func=self.init_func)
@@ -0,0 +1,342 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+from backend.calc_functions import CalcFunctions
+from backend.system_registry import SystemRegistry
+
+
+class OrbitPaths:
+    # Default largest distance between a closed path and the ellipse it follows, as a fraction of the semi-major axis
+    DEFAULT_TOLERANCE: float = 1e-5
+    MIN_SAMPLES: int = 64
+    # Relative paths are sampled so that they deviate from the true motion by at most SAMPLING_PIXELS pixels of a
+    # view of the whole path REFERENCE_PIXELS wide. Sampling starts from INITIAL_SAMPLES_PER_ORBIT samples per orbit
+    # of the faster of the planet and the centre and halves the intervals that are too coarse, at most
+    # MAX_REFINEMENTS times and until the path has MAX_RELATIVE_SAMPLES samples
+    REFERENCE_PIXELS: int = 1000
+    SAMPLING_PIXELS: float = 0.25
+    INITIAL_SAMPLES_PER_ORBIT: int = 16
+    MAX_REFINEMENTS: int = 12
+    MAX_RELATIVE_SAMPLES: int = 1_000_000
+    # Deviation in pixels below which points of a path are dropped before it is drawn
+    DECIMATION_PIXELS: float = 1.0
+    # Paths are resampled for a view of the axes once they deviate from the true motion by more than RESAMPLING_PIXELS
+    # pixels of it. Only the parts of a path inside the view are resampled, to SAMPLING_PIXELS pixels of the view, by
+    # halving their intervals at most MAX_VIEW_REFINEMENTS times and adding at most MAX_VIEW_SAMPLES samples
+    RESAMPLING_PIXELS: float = 0.5
+    MAX_VIEW_REFINEMENTS: int = 24
+    MAX_VIEW_SAMPLES: int = 250_000
+    # Memory budget in bytes of the relative paths and of the paths resampled for views, the least recently used are
+    # dropped beyond this
+    MAX_BYTES: int = 256 * 1024 * 1024
+
+    # ("closed", star system, body, dimensions, tolerance) -> samples of a closed path, each path is generated on
+    # first use
+    _CLOSED_PATHS: dict[tuple, tuple] = {}
+    # ("relative", star system, body, centre, time span, time model, dimensions) -> samples of a relative path and
+    # ("view", key of the samples, view, decimate) -> points drawn in a view, ordered from least to most recently
+    # used, with the size in bytes of every entry
+    _PATHS: OrderedDict[tuple, tuple[object, int]] = OrderedDict()
+    _nbytes: int = 0
+    # Closed and relative paths are sampled by the threads calculating animations and resampled by the path resampler
+    # thread
+    _LOCK = threading.RLock()
+
+    @staticmethod
+    def closed_size(semi_minor: float, eccentricity: float, tolerance: float = DEFAULT_TOLERANCE) -> int:
+        """
+        Finds the number of samples, evenly spaced in orbital angle, for which the chords of a closed path stay within
+        the tolerance of the ellipse. A chord over an angle h deviates from the ellipse by about r^2 h^2 / (8 p), with
+        p the semi-latus rectum, which is largest at aphelion where it is a h^2 (1 + e) / (8 (1 - e)) for a
+        semi-major axis a
+        """
+        if semi_minor == 0:
+            # The star does not move around itself
+            return 1
+        e = eccentricity
+        step = math.sqrt(8 * tolerance * (1 - e) / (1 + e))
+        return max(math.ceil(2 * math.pi / step) + 1, OrbitPaths.MIN_SAMPLES)
+
+    @staticmethod
+    def closed_samples(solar_system: str, body: str, dims: int, tolerance: float = DEFAULT_TOLERANCE) -> tuple:
+        """
+        Retrieves the samples of one orbit of a body around the star, generating them if they have not been used
+        before. The path only depends on the body, as every orbit around the star follows the same ellipse whatever
+        the time model or number of orbits, so it is shared by every animation
+        :param solar_system: enum key of the star system
+        :param body: enum key of the body
+        :param dims: 2 or 3
+        :param tolerance: largest deviation from the ellipse as a fraction of the semi-major axis
+        :return: (key of the samples, function giving the points of the orbit at any orbital angles, orbital angles of
+        the samples, read-only path of shape (samples, dims) starting and ending at aphelion, largest deviation of the
+        path from the ellipse in AU)
+        """
+        key = ("closed", solar_system, body, dims, float(tolerance))
+        with OrbitPaths._LOCK:
+            samples = OrbitPaths._CLOSED_PATHS.get(key)
+        if samples is None:
+            system = SystemRegistry.get(solar_system)
+            semi_minor = system.value("semi_minor_axis", body)
+            eccentricity = system.value("eccentricity", body)
+            inclination = [system.value("inclination_angle", body)] if dims == 3 else None
+
+            def positions(theta_vals):
+                return CalcFunctions.orbital_positions(theta_vals[np.newaxis], [semi_minor], [eccentricity],
+                                                       inclination)[0]
+
+            theta_vals = np.linspace(0, 2 * math.pi, OrbitPaths.closed_size(semi_minor, eccentricity, tolerance))
+            path = positions(theta_vals)
+            path.setflags(write=False)
+            samples = (key, positions, theta_vals, path, tolerance * semi_minor / (1 - eccentricity ** 2))
+            # Another thread may have generated the same path meanwhile, every caller then gets the one kept
+            with OrbitPaths._LOCK:
+                samples = OrbitPaths._CLOSED_PATHS.setdefault(key, samples)
+        return samples
+
+    @staticmethod
+    def closed_path(solar_system: str, body: str, dims: int, tolerance: float = DEFAULT_TOLERANCE) -> np.ndarray:
+        return OrbitPaths.closed_samples(solar_system, body, dims, tolerance)[3]
+
+    @staticmethod
+    def relative_samples(solar_system: str, body: str, centre: str, span: float, time_model: str,
+                         dims: int) -> tuple:
+        """
+        Retrieves the samples of the path of a body around another body over a span of time, sampling it if it has
+        not been used before. The path is refined where it curves, so the loops of retrograde motion stay sharp while
+        the nearly straight stretches between them keep few samples
+        :param solar_system: enum key of the star system
+        :param body: enum key of the body
+        :param centre: enum key of the body at the centre
+        :param span: time covered by the path in years, starting at 0
+        :param time_model: one of CalcFunctions.TIME_MODELS
+        :param dims: 2 or 3
+        :return: (key of the samples, function giving the points of the path at any times, times of the samples,
+        read-only path of shape (samples, dims), largest deviation of the path from the true motion in AU)
+        """
+        key = ("relative", solar_system, body, centre, float(span), time_model, dims)
+        samples = OrbitPaths.recall(key)
+        if samples is not None:
+            return samples
+        elements = SystemRegistry.get(solar_system).elements([body, centre])
+        inclination = elements["inclination_angle"] if dims == 3 else None
+
+        def positions(time_vals):
+            theta_vals = CalcFunctions.orbital_angles(time_vals, elements["orbital_period"],
+                                                      elements["eccentricity"], time_model)
+            both = CalcFunctions.orbital_positions(theta_vals, elements["semi_minor_axis"],
+                                                   elements["eccentricity"], inclination)
+            return both[0] - both[1]
+
+        # The path stays within the sum of the largest distances of both bodies from the star
+        extent = 2 * float(np.sum(elements["semi_minor_axis"] / (1 - elements["eccentricity"])))
+        tolerance = extent / OrbitPaths.REFERENCE_PIXELS * OrbitPaths.SAMPLING_PIXELS
+        # Once the motion repeats the path retraces itself, so only the first repeat is sampled
+        repeat = CalcFunctions.exact_repeat(elements["orbital_period"],
+                                            elements["semi_minor_axis"] / (1 - elements["eccentricity"]), span,
+                                            tolerance)
+        span = span if repeat is None else repeat
+        moving = elements["orbital_period"][elements["orbital_period"] > 0]
+        fastest = float(moving.min()) if len(moving) else span
+        num_initial = math.ceil(OrbitPaths.INITIAL_SAMPLES_PER_ORBIT * span / max(fastest, 1e-12)) + 1
+        time_vals = np.linspace(0, span, min(max(num_initial, 2), OrbitPaths.MAX_RELATIVE_SAMPLES))
+        time_vals, path = OrbitPaths.refine(positions, time_vals, positions(time_vals), tolerance,
+                                            np.ones(len(time_vals) - 1, dtype=bool), OrbitPaths.MAX_REFINEMENTS,
+                                            OrbitPaths.MAX_RELATIVE_SAMPLES)
+        path.setflags(write=False)
+        samples = (key, positions, time_vals, path, tolerance)
+        OrbitPaths.remember(key, samples, time_vals.nbytes + path.nbytes)
+        return samples
+
+    @staticmethod
+    def relative_path(solar_system: str, body: str, centre: str, span: float, time_model: str,
+                      dims: int) -> np.ndarray:
+        return OrbitPaths.relative_samples(solar_system, body, centre, span, time_model, dims)[3]
+
+    @staticmethod
+    def recall(key: tuple):
+        # Entry of the memo, marked as the most recently used, or None
+        with OrbitPaths._LOCK:
+            entry = OrbitPaths._PATHS.get(key)
+            if entry is None:
+                return None
+            OrbitPaths._PATHS.move_to_end(key)
+            return entry[0]
+
+    @staticmethod
+    def remember(key: tuple, value, size: int):
+        """
+        Keeps an entry in the memo, dropping the least recently used ones until the memo fits in MAX_BYTES. Entries
+        larger than the whole budget are not kept
+        :param key: key of the entry
+        :param value: samples or points of a path
+        :param size: size of the arrays of the entry in bytes
+        :return: None
+        """
+        with OrbitPaths._LOCK:
+            if key in OrbitPaths._PATHS:
+                OrbitPaths._nbytes -= OrbitPaths._PATHS.pop(key)[1]
+            if size > OrbitPaths.MAX_BYTES:
+                return
+            OrbitPaths._PATHS[key] = (value, size)
+            OrbitPaths._nbytes += size
+            OrbitPaths.evict()
+
+    @staticmethod
+    def evict():
+        with OrbitPaths._LOCK:
+            while OrbitPaths._nbytes > OrbitPaths.MAX_BYTES and OrbitPaths._PATHS:
+                _, (_, size) = OrbitPaths._PATHS.popitem(last=False)
+                OrbitPaths._nbytes -= size
+
+    @staticmethod
+    def set_max_bytes(max_bytes: int):
+        OrbitPaths.MAX_BYTES = max_bytes
+        OrbitPaths.evict()
+
+    @staticmethod
+    def refine(positions: Callable[[np.ndarray], np.ndarray], params: np.ndarray, path: np.ndarray,
+               tolerance: float, active: np.ndarray, max_refinements: int, max_samples: int,
+               bounds: Optional[tuple[np.ndarray, np.ndarray]] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Splits every active interval of a path whose midpoint lies further than the tolerance from its chord, then
+        only checks the halves of the intervals that were split
+        :param positions: function giving the points of the path at any parameter values
+        :param params: increasing parameter values of the samples
+        :param path: array of shape (samples, dims) of the points at the parameter values
+        :param tolerance: largest distance of a midpoint from its chord
+        :param active: boolean array with one value per interval, True for the intervals that are checked
+        :param max_refinements: most times an interval is halved
+        :param max_samples: number of samples beyond which the path is not refined further
+        :param bounds: lower and upper corners of a box, halves outside which are not checked again
+        :return: parameter values and points of the refined path
+        """
+        for _ in range(max_refinements):
+            segments = np.flatnonzero(active)
+            if len(segments) == 0:
+                break
+            mid_params = (params[segments] + params[segments + 1]) / 2
+            mid_points = positions(mid_params)
+            split = OrbitPaths.chord_distances(mid_points, path[segments], path[segments + 1]) > tolerance
+            if not split.any() or len(params) + np.count_nonzero(split) > max_samples:
+                break
+            segments = segments[split]
+            params = np.insert(params, segments + 1, mid_params[split])
+            path = np.insert(path, segments + 1, mid_points[split], axis=0)
+            active = np.zeros(len(params) - 1, dtype=bool)
+            halves = np.concatenate((segments + np.arange(len(segments)), segments + np.arange(1, len(segments) + 1)))
+            if bounds is not None:
+                halves = halves[OrbitPaths.in_box(path[halves], path[halves + 1], *bounds)]
+            active[halves] = True
+        return params, path
+
+    @staticmethod
+    def in_box(starts: np.ndarray, ends: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+        # Whether the bounding box of every segment overlaps the box between the lower and upper corners
+        return np.all((np.maximum(starts, ends) >= lower) & (np.minimum(starts, ends) <= upper), axis=1)
+
+    @staticmethod
+    def pixel_size(view: tuple) -> float:
+        # Size of one pixel of a view (x limits, y limits, width, height) in data units, the smaller of its width and
+        # height
+        (x_min, x_max), (y_min, y_max), width, height = view
+        return min(abs(x_max - x_min) / max(width, 1), abs(y_max - y_min) / max(height, 1))
+
+    @staticmethod
+    def display_path(samples: tuple, view: tuple, decimate: bool = True) -> np.ndarray:
+        """
+        Finds the points of a 2D path to draw in a view of the axes. The samples are used as they are unless they are
+        too coarse for the view, in which case only the parts of the path inside the view are resampled, so zooming in
+        never generates detail that is off screen. The points are kept for the view until the memo drops them
+        :param samples: samples of the path, as returned by closed_samples or relative_samples
+        :param view: (x limits, y limits, width, height) of the axes, the size in pixels
+        :param decimate: whether the points are decimated to the pixel size of the view
+        :return: array of shape (points, 2), in which rows of NaN separate the parts of the path inside the view
+        """
+        key, positions, params, path, tolerance = samples
+        pixel = OrbitPaths.pixel_size(view)
+        resample = tolerance > OrbitPaths.RESAMPLING_PIXELS * pixel and len(path) >= 2
+        if not resample and not decimate:
+            return path
+        view_key = ("view", key, view, decimate)
+        points = OrbitPaths.recall(view_key)
+        if points is None:
+            points = OrbitPaths.view_points(positions, params, path, tolerance, view, decimate) if resample else \
+                OrbitPaths.decimate(path, OrbitPaths.DECIMATION_PIXELS * pixel)
+            points.setflags(write=False)
+            OrbitPaths.remember(view_key, points, points.nbytes)
+        return points
+
+    @staticmethod
+    def view_points(positions: Callable[[np.ndarray], np.ndarray], params: np.ndarray, path: np.ndarray,
+                    tolerance: float, view: tuple, decimate: bool) -> np.ndarray:
+        # Resamples the parts of a path inside a view to SAMPLING_PIXELS pixels of it, see display_path
+        pixel = OrbitPaths.pixel_size(view)
+        # Deviation within which points are dropped, none are dropped when the path is not decimated
+        decimation = OrbitPaths.DECIMATION_PIXELS * pixel if decimate else 0
+        # The path lies within its tolerance of its chords, so chords that far from the view may show in it
+        (x_min, x_max), (y_min, y_max), _, _ = view
+        bounds = (np.array([min(x_min, x_max), min(y_min, y_max)]) - tolerance,
+                  np.array([max(x_min, x_max), max(y_min, y_max)]) + tolerance)
+        params, path = OrbitPaths.refine(positions, params, path, OrbitPaths.SAMPLING_PIXELS * pixel,
+                                         OrbitPaths.in_box(path[:-1], path[1:], *bounds),
+                                         OrbitPaths.MAX_VIEW_REFINEMENTS, len(params) + OrbitPaths.MAX_VIEW_SAMPLES,
+                                         bounds)
+        # Runs of consecutive intervals inside the view, each drawn as a separate part of the line
+        edges = np.diff(np.concatenate(([0], OrbitPaths.in_box(path[:-1], path[1:], *bounds), [0])).astype(np.int8))
+        gap = np.full((1, path.shape[1]), np.nan)
+        parts = []
+        for start, stop in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+            part = path[start:stop + 1]
+            parts += [OrbitPaths.decimate(part, decimation) if decimate else part, gap]
+        return np.concatenate(parts[:-1]) if parts else path[:0]
+
+    @staticmethod
+    def chord_distances(points: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Finds the distance of every point from the line through the corresponding start and end, or from the start
+        where the start and end coincide
+        :param points: array of shape (n, dims)
+        :param starts: array of shape (n, dims)
+        :param ends: array of shape (n, dims)
+        :return: array of n distances
+        """
+        chords = ends - starts
+        offsets = points - starts
+        lengths = np.einsum("ij,ij->i", chords, chords)
+        along = np.divide(np.einsum("ij,ij->i", offsets, chords), lengths, out=np.zeros_like(lengths),
+                          where=lengths > 0)
+        return np.linalg.norm(offsets - along[:, np.newaxis] * chords, axis=1)
+
+    @staticmethod
+    def decimate(path: np.ndarray, tolerance: float) -> np.ndarray:
+        """
+        Drops the points of a path that lie within the tolerance of the simplified path, by the Ramer-Douglas-Peucker
+        method. Every interval between the points kept so far is split at its furthest point at once, so the number
+        of passes grows with the depth of the splitting rather than the number of points
+        :param path: array of shape (samples, dims)
+        :param tolerance: largest distance of a dropped point from the simplified path, in the units of the path
+        :return: array of the points kept, in order, always including the first and last points
+        """
+        num_points = len(path)
+        if num_points <= 2:
+            return path
+        keep = np.zeros(num_points, dtype=bool)
+        keep[[0, -1]] = True
+        point_indices = np.arange(num_points)
+        while True:
+            kept = np.flatnonzero(keep)
+            # Interval between kept points that every point lies in
+            interval = np.minimum(np.searchsorted(kept, point_indices, side="right") - 1, len(kept) - 2)
+            distances = OrbitPaths.chord_distances(path, path[kept[interval]], path[kept[interval + 1]])
+            distances[keep] = 0
+            furthest = np.maximum.reduceat(distances, kept[:-1])
+            split = furthest > tolerance
+            if not split.any():
+                return path[keep]
+            candidates = np.flatnonzero(split[interval] & (distances == furthest[interval]))
+            _, first = np.unique(interval[candidates], return_index=True)
+            keep[candidates[first]] = True
+
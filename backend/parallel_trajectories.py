@@ -0,0 +1,186 @@
+import math
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+import matplotlib
+import numpy as np
+
+#
+# Method of the animation that calculates each trajectory array over a range of samples, called as
+# method(start, stop, out) with out the part of the array holding those samples
+#
+CALCULATIONS: dict[str, str] = {
+    "frame_data": "calculate_frames",
+}
+
+
+class ParallelTrajectories:
+    # Jobs with fewer samples than this, counted over every planet, are calculated in the calling process, where
+    # starting workers and pickling the animation would take longer than the calculation itself
+    DEFAULT_MIN_WORK: int = 4_000_000
+    # Number of tasks each array is split into per worker, so that workers that finish early take on more work
+    TASKS_PER_WORKER: int = 4
+    # Planets are only split between tasks when every task gets at least this many, as every task also calculates
+    # the orbit of the centre
+    MIN_PLANETS_PER_TASK: int = 16
+    # Workers are started in a fresh interpreter, as forking copies the threads and locks of the GUI and of the
+    # calculation workers in whatever state they are in. Spawned workers import the backend modules and unpickle the
+    # animation of each task
+    START_METHOD: str = "spawn"
+
+    def __init__(self, max_workers: Optional[int] = None, min_work: int = DEFAULT_MIN_WORK):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_work = min_work
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def is_worthwhile(self, num_rows: int, num_planets: int) -> bool:
+        return self.max_workers > 1 and num_rows * num_planets >= self.min_work
+
+    def executor(self) -> ProcessPoolExecutor:
+        # Workers are started on first use and kept for later jobs
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(ParallelTrajectories.START_METHOD)
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=context, initializer=init_worker)
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def split(self, num_rows: int, num_planets: int) -> list[tuple[int, int, int, int]]:
+        """
+        Splits an array into tasks by planet and by range of samples
+        :param num_rows: number of samples of the array
+        :param num_planets: number of planets of the array
+        :return: list of (start, stop, first planet, last planet), each covering a block of the array
+        """
+        num_groups = max(1, min(self.max_workers, num_planets // ParallelTrajectories.MIN_PLANETS_PER_TASK))
+        num_chunks = math.ceil(ParallelTrajectories.TASKS_PER_WORKER * self.max_workers / num_groups)
+        chunk_size = max(math.ceil(num_rows / num_chunks), 1)
+        planet_bounds = np.linspace(0, num_planets, num_groups + 1).round().astype(int)
+        return [(start, min(start + chunk_size, num_rows), int(first), int(last))
+                for first, last in zip(planet_bounds[:-1], planet_bounds[1:])
+                for start in range(0, num_rows, chunk_size)]
+
+    def fill(self, animation, arrays: dict[str, np.ndarray]):
+        """
+        Calculates the trajectories of an animation in the worker processes, each task writing its block straight
+        into the array through shared memory, so that no results are pickled back. Memory-mapped arrays of the
+        trajectory store are written through their files, other arrays through shared memory blocks that are
+        copied into them once every task has finished. Progress is reported through animation.report_progress,
+        which stops the calculation if it has been cancelled
+        :param animation: Animation2D or Animation3D whose samples have been counted
+        :param arrays: arrays of the shapes given by animation.trajectory_shapes
+        :return: None
+        """
+        total = sum(array.shape[0] * array.shape[1] for array in arrays.values())
+        done = 0
+        blocks = {}
+        futures = {}
+        try:
+            for name, array in arrays.items():
+                if isinstance(array, np.memmap) and array.filename is not None:
+                    array.flush()
+                    target = ("file", array.filename)
+                else:
+                    blocks[name] = SharedMemory(create=True, size=max(array.nbytes, 1))
+                    target = ("shared_memory", blocks[name].name, array.shape, array.dtype.str)
+                for start, stop, first, last in self.split(array.shape[0], array.shape[1]):
+                    future = self.executor().submit(calculate_block, animation, CALCULATIONS[name], target,
+                                                    start, stop, first, last)
+                    futures[future] = (stop - start) * (last - first)
+            animation.report_progress(0, total)
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result()
+                    done += futures[future]
+                animation.report_progress(done, total)
+            for name, block in blocks.items():
+                arrays[name][...] = np.ndarray(arrays[name].shape, arrays[name].dtype, buffer=block.buf)
+        finally:
+            # Tasks that have not started are dropped and running ones are waited for, so no worker writes to a
+            # block after it is released
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            for block in blocks.values():
+                block.close()
+                block.unlink()
+
+
+def init_worker():
+    """
+    Runs once in each worker process before its first task. Workers only calculate, so they keep the non-interactive
+    Agg backend and ignore the backend the animation modules select when a task imports them, which would need a
+    display
+    :return: None
+    """
+    matplotlib.use("Agg")
+    matplotlib.use = lambda *args, **kwargs: None
+
+
+def calculate_block(animation, method: str, target: tuple, start: int, stop: int, first: int, last: int):
+    """
+    Runs in a worker process: calculates one block of a trajectory array and writes it into the shared array
+    :param animation: copy of the animation holding only its settings and orbital elements
+    :param method: name of the method of the animation that calculates the array
+    :param target: ("file", path) of a .npy file or ("shared_memory", name, shape, dtype) of a shared memory block
+    :param start: index of the first sample of the block
+    :param stop: index after the last sample of the block
+    :param first: index of the first planet of the block
+    :param last: index after the last planet of the block
+    :return: None
+    """
+    animation.select_planets(first, last)
+    calculate = getattr(animation, method)
+    if target[0] == "file":
+        array = np.load(target[1], mmap_mode="r+")
+        calculate(start, stop, array[start:stop, first:last])
+        array.flush()
+        del array
+        return
+    _, name, shape, dtype = target
+    block = attach_block(name)
+    array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    calculate(start, stop, array[start:stop, first:last])
+    del array
+    block.close()
+
+
+def attach_block(name: str) -> SharedMemory:
+    """
+    Attaches a worker process to a shared memory block without tracking it. The block belongs to the parent process,
+    which unlinks it, whereas a block tracked by the worker would be unlinked by the resource tracker of the worker,
+    or dropped from the tracker the worker shares with the parent, when the worker exits
+    :param name: name of the shared memory block
+    :return: attached block
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    # Before Python 3.13 attaching always registers the block, and unregistering it afterwards would also drop the
+    # registration of the parent from a tracker they share, so the registration is skipped. Workers run one task at a
+    # time on their main thread, so no other attachment sees the replaced function
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+#
+# Worker pool shared by every animation unless another one is given
+#
+PARALLEL_TRAJECTORIES = ParallelTrajectories()
@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class PathResampler:
+    # Time in ms that the view of the axes has to stay the same before the paths are resampled, so that zooming or
+    # panning only resamples the view it ends on
+    DELAY: int = 200
+    # Interval in ms at which a changed view and a running resampling job are checked
+    POLL_INTERVAL: int = 50
+
+    # Resampling jobs of every animation run one at a time on a single background thread
+    _EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="path-resampler")
+
+    def __init__(self, ax, prepare: Callable[[tuple], Callable[[], Any]], apply: Callable[[tuple, Any], None]):
+        """
+        Resamples the paths drawn on a 2D axes whenever its view changes, once the view has stayed the same for DELAY
+        ms. The job runs in the background and its result is applied on the GUI thread, unless the view has changed
+        again in the meantime
+        :param ax: axes the paths are drawn on
+        :param prepare: called on the GUI thread with the new view, returns the job that resamples the paths
+        :param apply: called on the GUI thread with the view and the result of its job
+        """
+        self._ax = ax
+        self._prepare = prepare
+        self._apply = apply
+
+        # View the paths are currently drawn for, as (x limits, y limits, width, height)
+        self._view = PathResampler.axes_view(self._ax)
+        self._changed_at = 0.0
+
+        # Running job and the view it resamples the paths for
+        self._future: Optional[Future] = None
+        self._job_view = None
+
+        self._timer = ax.figure.canvas.new_timer(interval=PathResampler.POLL_INTERVAL)
+        self._timer.add_callback(self.poll)
+        self._limit_cids = [ax.callbacks.connect("xlim_changed", self.on_view_changed),
+                            ax.callbacks.connect("ylim_changed", self.on_view_changed)]
+        self._resize_cid = ax.figure.canvas.mpl_connect("resize_event", self.on_view_changed)
+
+    @staticmethod
+    def axes_view(ax) -> tuple:
+        # View of the axes as its x limits, y limits and its width and height in pixels
+        bbox = ax.bbox
+        return ax.get_xlim(), ax.get_ylim(), round(bbox.width), round(bbox.height)
+
+    def mark_drawn(self):
+        # The paths have been drawn for the current view, for instance after the settings changed
+        self._view = PathResampler.axes_view(self._ax)
+
+    def on_view_changed(self, *_):
+        self._changed_at = time.monotonic()
+        self._timer.start()
+
+    def poll(self):
+        if self._future is not None:
+            if not self._future.done():
+                return
+            future, view = self._future, self._job_view
+            self._future = self._job_view = None
+            # Results for a view that has since been left are dropped
+            if view == PathResampler.axes_view(self._ax):
+                self._apply(view, future.result())
+                self._view = view
+        view = PathResampler.axes_view(self._ax)
+        if view == self._view:
+            self._timer.stop()
+        elif time.monotonic() - self._changed_at >= PathResampler.DELAY / 1000:
+            self._job_view = view
+            self._future = PathResampler._EXECUTOR.submit(self._prepare(view))
+
+    def dispose(self):
+        """
+        Stops checking the view and disconnects from the axes and canvas, dropping any job that has not started
+        :return: None
+        """
+        self._timer.stop()
+        self._timer.remove_callback(self.poll)
+        for cid in self._limit_cids:
+            self._ax.callbacks.disconnect(cid)
+        self._ax.figure.canvas.mpl_disconnect(self._resize_cid)
+        if self._future is not None:
+            self._future.cancel()
+        self._future = None
+        self._prepare = self._apply = None
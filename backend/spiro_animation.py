@@ -1,12 +1,22 @@
+import threading
 from typing import Callable, Optional
 
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
+from matplotlib.backend_bases import ResizeEvent
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
 from backend.constants import Constants
 import numpy as np
 import math
-from backend.calc_functions import CalcFunctions
+from backend.calc_functions import CalcFunctions, CalculationCancelled
+from backend.line_rasteriser import LineRasteriser
+from backend.orbit_paths import OrbitPaths
+from backend.path_resampler import PathResampler
+from backend.system_registry import SystemRegistry
 from random import sample
 
 matplotlib.use('TkAgg')
@@ -15,11 +25,47 @@ matplotlib.use('TkAgg')
 class SpiroAnimation:
     COLOURS = ["black", "red", "orange", "green", "blue", "darkviolet"]
     LINES_PER_ORBIT: int = 70
+    LINE_WIDTH: float = 0.15
+    # Number of lines drawn as vectors before they are rasterised into the cached image of completed lines
+    LINE_CACHE_CHUNK: int = 70
+    # "vector" draws lines with matplotlib, "raster" accumulates them into a pixel buffer shown as one image
+    RENDER_MODES = ("vector", "raster")
+    # Maximum number of frames in raster mode, more lines are drawn per frame for larger spirographs
+    RASTER_MAX_FRAMES: int = 2000
+    # "cap" stops generating lines once the pattern repeats, "cycle" keeps the planets moving over the lines of one
+    # repeat, "off" always generates every line
+    CLOSURE_MODES = ("cap", "cycle", "off")
+    # The pattern is only treated as repeating when, over every repeat in the animation, the planets drift from their
+    # true positions by less than this fraction of the size of the plot, which is half a pixel of a plot 1000 pixels
+    # wide
+    CLOSURE_TOLERANCE: float = 5e-4
+    # Number of lines whose positions are calculated at once, between which progress is reported
+    CALCULATION_CHUNK: int = 65536
 
-    def __init__(self, fig, solar_system: str, planet_1: str, planet_2: str, N: int, speed: str, post_draw_callback: Optional[Callable] = None):
+    def __init__(self, fig, solar_system: str, planet_1: str, planet_2: str, N: int, speed: str, post_draw_callback: Optional[Callable] = None,
+                 render_mode: str = "vector", tone_mapping: str = "log", closure: str = "cap",
+                 time_model: str = "uniform", progress_callback: Optional[Callable[[float], None]] = None,
+                 cancel_event: Optional[threading.Event] = None):
+        if closure not in SpiroAnimation.CLOSURE_MODES:
+            raise ValueError(f"closure mode must be one of {SpiroAnimation.CLOSURE_MODES}")
+        if render_mode not in SpiroAnimation.RENDER_MODES:
+            raise ValueError(f"render mode must be one of {SpiroAnimation.RENDER_MODES}")
+        if tone_mapping not in LineRasteriser.TONE_MAPPINGS:
+            raise ValueError(f"tone mapping must be one of {LineRasteriser.TONE_MAPPINGS}")
+        if time_model not in CalcFunctions.TIME_MODELS:
+            raise ValueError(f"time model must be one of {CalcFunctions.TIME_MODELS}")
+        self._render_mode = render_mode
+        self._tone_mapping = tone_mapping
+        self._closure = closure
+        self._time_model = time_model
         self._solar_system = solar_system
         self.post_draw_callback = post_draw_callback
+        # Called with the fraction of the lines calculated so far, and checked to stop the calculation early, while
+        # the constructor calculates the lines, which may be away from the GUI thread
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
         self._constants = Constants.__dict__[self._solar_system]
+        self._system = SystemRegistry.get(self._solar_system)
 
         self._planet_1 = planet_1
         self._planet_2 = planet_2
@@ -30,20 +76,85 @@ class SpiroAnimation:
         # Total number of lines to show
         self._num_lines = N * SpiroAnimation.LINES_PER_ORBIT
 
-        # Endpoints of lines between planets
-        self._spiro_data = []
+        # Time in years between two consecutive lines
+        self._time_step = None
 
-        self._lines = []
+        # Time in years after which the pattern repeats, None if it does not repeat within the N orbits
+        self.repeat_period: Optional[float] = None
+
+        # Number of lines whose geometry is generated, fewer than the number of lines when the pattern repeats
+        self._num_generated = self._num_lines
+        self.detect_closure()
+
+        # Number of lines added by each frame, and the resulting number of frames
+        self._lines_per_frame = 1
+        if self._render_mode == "raster":
+            self._lines_per_frame = math.ceil(self._num_lines / SpiroAnimation.RASTER_MAX_FRAMES)
+        self._num_frames = math.ceil(self._num_lines / self._lines_per_frame)
+
+        # Positions of both planets when each line is drawn, array of shape (2, lines, 2)
+        self._anim_data = None
+
+        # Endpoints of lines between planets, array of shape (lines, 2, 2)
+        self._spiro_data = None
+
+        # Preallocated buffer of every line, each made of its two endpoints followed by a NaN row that separates it
+        # from the next line, so that the lines drawn so far are a single contiguous slice of the buffer
+        self._segment_buffer = None
+
+        # Single artist holding the lines drawn since the last time lines were rasterised into the cache
+        self._spiro_lines = None
+
+        # Completed lines are rasterised into an offscreen canvas the size of the axes, which is shown by a single
+        # image artist, so the cost of a frame does not grow with the number of lines already drawn
+        self._line_image = None
+        self._cache_fig = None
+        self._cache_ax = None
+        self._cache_lines = None
+        self._cache_view = None
+        self._num_cached = 0
+
+        # In raster mode, lines are accumulated into a buffer at the pixel size of the axes instead
+        self._rasteriser: Optional[LineRasteriser] = None
+        self._raster_rgba = None
+        self._num_rasterised = 0
 
         self._colour_1, self._colour_2 = sample(SpiroAnimation.COLOURS, 2)
 
         # Difference in time between drawing of two consecutive lines
-        match speed:
-            case "slow": self._time_diff = 100
-            case "medium": self._time_diff = 40
-            case "fast": self._time_diff = 10
+        self._time_diff = None
+        self.ani = None
+        self.set_speed(speed)
 
-        self._fig: plt.Figure = fig
+        self._fig: Optional[plt.Figure] = None
+        self._ax = None
+
+        self._orbit_1 = None
+        self._anim_data_1 = None
+        self._anim_1 = None
+        self._orbit_2 = None
+        self._anim_data_2 = None
+        self._anim_2 = None
+
+        # Resamples the orbits in the background when the axes are zoomed or panned
+        self._resampler: Optional[PathResampler] = None
+
+        self.calculate_anim_data()
+        self.generate_line_data()
+        self.progress_callback = None
+        self.cancel_event = None
+        if fig is not None:
+            self.attach(fig)
+
+    def attach(self, fig: plt.Figure):
+        """
+        Creates the axes and artists of the animation on a figure and starts it. An animation created without a
+        figure only calculates its lines, which lets them be calculated away from the GUI thread, and is attached to
+        a figure on the GUI thread once they are ready
+        :param fig: figure to draw the animation on
+        :return: None
+        """
+        self._fig = fig
         self._ax = self._fig.subplots()
         self._ax.set_title(f"Spirograph with {self._planet_1} and {self._planet_2}",
                            fontsize=10)
@@ -55,85 +166,261 @@ class SpiroAnimation:
         self._ax.spines['bottom'].set_visible(False)
         self._ax.grid(False)
 
-        self._orbit_1 = None
-        self._anim_data_1 = []
         self._anim_1 = self._ax.plot([], [], marker="o", color=self._colour_1)[0]
-        self._orbit_2 = None
-        self._anim_data_2 = []
         self._anim_2 = self._ax.plot([], [], marker="o", color=self._colour_2)[0]
-
-        self.generate_line_data()
         self.set_limits()
         self.calculate_orbit_data()
-        self.calculate_anim_data()
         self.create_animation()
+        self._resampler = PathResampler(self._ax, self.resampling_job, self.apply_resampled)
+
+    def set_speed(self, speed: str):
+        """
+        Sets the interval between frames, which takes effect immediately if the animation is running
+        :param speed: "slow", "medium" or "fast"
+        :return: None
+        """
+        match speed:
+            case "slow": self._time_diff = 100
+            case "medium": self._time_diff = 40
+            case "fast": self._time_diff = 10
+        if self.ani is not None:
+            self.ani.event_source.interval = self._time_diff
+
+    def stop(self):
+        # Pauses the animation and removes the callbacks of its timer, so that a canvas that is reused for another
+        # animation cannot make it draw again. Nothing else then refers to the animation, and as the canvas only keeps
+        # weak references to its event handlers, they are disconnected once it is released
+        if self.ani is not None and self.ani.event_source is not None:
+            self.ani.pause()
+            self.ani.event_source.callbacks.clear()
+
+    def dispose(self):
+        """
+        Stops the animation and releases its artists, axes, line buffers and offscreen line cache, so that nothing the
+        animation created is kept alive by the figure or the canvas. The animation cannot be used afterwards
+        :return: None
+        """
+        self.stop()
+        self.ani = None
+        self.post_draw_callback = None
+        if self._resampler is not None:
+            self._resampler.dispose()
+            self._resampler = None
+        if self._fig is not None and self._ax in self._fig.axes:
+            self._fig.delaxes(self._ax)
+        self._anim_1 = self._anim_2 = None
+        self._orbit_1 = self._orbit_2 = None
+        self._spiro_lines = None
+        self._line_image = None
+        self._cache_fig = self._cache_ax = self._cache_lines = None
+        self._rasteriser = None
+        self._raster_rgba = None
+        self._anim_data = self._anim_data_1 = self._anim_data_2 = None
+        self._spiro_data = None
+        self._segment_buffer = None
+
+    def detect_closure(self):
+        """
+        Finds when the pattern starts to repeat from the ratio of the orbital periods. When the repeat is exact enough
+        for the lines of every later repeat to fall within CLOSURE_TOLERANCE of the lines of the first, the lines are
+        spaced so that one repeat is a whole number of lines and only the lines of one repeat are generated
+        :return: None
+        """
+        periods = self._system.field("orbital_period", [self._planet_1, self._planet_2])
+        span = float(periods.max()) * self._num_orbits
+        self._time_step = span / max(self._num_lines - 1, 1)
+        if self._closure == "off":
+            return
+        self.repeat_period = CalcFunctions.repeat_period(periods, max_time=span)
+        distances = self._system.field("semi_minor_axis", [self._planet_1, self._planet_2]) / \
+            (1 - self._system.field("eccentricity", [self._planet_1, self._planet_2]))
+        repeat = CalcFunctions.exact_repeat(periods, distances, span,
+                                            SpiroAnimation.CLOSURE_TOLERANCE * 2 * float(distances.max()))
+        if repeat is None:
+            return
+        self._num_generated = max(round(repeat / self._time_step), 1)
+        self._time_step = repeat / self._num_generated
+        self._num_lines = round(span / self._time_step) + 1
+        if self._closure == "cap":
+            self._num_lines = self._num_generated
+
+    def calculate_anim_data(self):
+        elements = self._system.elements([self._planet_1, self._planet_2])
+
+        # Regular points in time for each line drawn between the planets, calculated a chunk at a time
+        self._anim_data = np.empty((2, self._num_generated, 2))
+        chunk_size = SpiroAnimation.CALCULATION_CHUNK
+        self.report_progress(0)
+        for start in range(0, self._num_generated, chunk_size):
+            stop = min(start + chunk_size, self._num_generated)
+            time_vals = np.arange(start, stop) * self._time_step
+            self._anim_data[:, start:stop] = CalcFunctions.orbital_vals_batch(time_vals,
+                                                                              elements["semi_minor_axis"],
+                                                                              elements["eccentricity"],
+                                                                              elements["orbital_period"],
+                                                                              time_model=self._time_model)
+            self.report_progress(stop)
+        self._anim_data_1 = self._anim_data[0]
+        self._anim_data_2 = self._anim_data[1]
 
-    def calculate_point(self, t, e, b, P):
-        theta = (2 * math.pi * t) / P
-        r = b / (1 - e * np.cos(float(theta)))
-        return [r * np.cos(float(theta)), r * np.sin(float(theta))]
+    def report_progress(self, done: int):
+        """
+        Passes the fraction of lines calculated to the progress callback, and stops the calculation by raising
+        CalculationCancelled once the cancel event is set
+        :param done: number of lines calculated
+        :return: None
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise CalculationCancelled()
+        if self.progress_callback is not None:
+            self.progress_callback(done / max(self._num_generated, 1))
 
     def generate_line_data(self):
-        period_1 = float(self._constants.OrbitalPeriod[self._planet_1].value)
-        period_2 = float(self._constants.OrbitalPeriod[self._planet_2].value)
-        max_period = max(period_1, period_2)
-
-        # Regular points in time for each line drawn between the planets
-        time_vals = np.linspace(0, self._num_orbits * float(max_period), self._num_lines)
-        eccentricity_1 = float(self._constants.Eccentricity[self._planet_1].value)
-        eccentricity_2 = float(self._constants.Eccentricity[self._planet_2].value)
-        semi_minor_1 = float(self._constants.SemiMinorAxis[self._planet_1].value)
-        semi_minor_2 = float(self._constants.SemiMinorAxis[self._planet_2].value)
-
-        for time in time_vals:
-            x_1, y_1 = self.calculate_point(time, eccentricity_1, semi_minor_1, period_1)
-            x_2, y_2 = self.calculate_point(time, eccentricity_2, semi_minor_2, period_2)
-            self._spiro_data.append(([x_1, x_2], [y_1, y_2]))
+        # Each line joins the positions of the two planets at the same point in time
+        self._spiro_data = self._anim_data.transpose(1, 0, 2)
+        if self._render_mode == "vector":
+            self._segment_buffer = np.full((self._num_generated, 3, 2), np.nan)
+            self._segment_buffer[:, :2] = self._spiro_data
 
     def set_limits(self):
-        min_x = min([min(vals[0]) for vals in self._spiro_data])
-        max_x = max([max(vals[0]) for vals in self._spiro_data])
-        min_y = min([min(vals[1]) for vals in self._spiro_data])
-        max_y = max([max(vals[1]) for vals in self._spiro_data])
+        # Every line joins two points of the orbits, so the lines lie within the boxes of the orbits, which follow from
+        # the orbital elements
+        elements = self._system.elements([self._planet_1, self._planet_2])
+        lower, upper = CalcFunctions.orbit_bounds(elements["semi_minor_axis"], elements["eccentricity"])
+        (min_x, min_y), (max_x, max_y) = lower.min(axis=0), upper.max(axis=0)
         padding_x = (max_x - min_x) / 20
         padding_y = (max_y - min_y) / 20
         self._ax.set_xlim([min_x - padding_x, max_x + padding_x])
         self._ax.set_ylim([min_y - padding_y, max_y + padding_y])
 
+    def orbit_samples(self) -> list[tuple]:
+        return [OrbitPaths.closed_samples(self._solar_system, planet, 2) for planet in (self._planet_1, self._planet_2)]
+
     def calculate_orbit_data(self):
-        theta_vals = np.linspace(0, math.pi * 2, 1000)
-        x_1, y_1 = CalcFunctions.orbital_vals_2d(theta_vals, self._planet_1, self._solar_system)
-        x_2, y_2 = CalcFunctions.orbital_vals_2d(theta_vals, self._planet_2, self._solar_system)
+        view = PathResampler.axes_view(self._ax)
+        (x_1, y_1), (x_2, y_2) = [OrbitPaths.display_path(samples, view, False).T for samples in self.orbit_samples()]
         self._orbit_1 = self._ax.plot(x_1, y_1, color=self._colour_1, lw=2,
                                       label=self._constants.Planet[self._planet_1].value)[0]
         self._orbit_2 = self._ax.plot(x_2, y_2, color=self._colour_2, lw=2,
                                       label=self._constants.Planet[self._planet_2].value)[0]
 
-    def calculate_anim_data(self):
-        period_1 = float(self._constants.OrbitalPeriod[self._planet_1].value)
-        period_2 = float(self._constants.OrbitalPeriod[self._planet_2].value)
-        max_period = max(period_1, period_2)
-        time_vals = np.linspace(0, max_period * self._num_orbits, self._num_lines)
-        theta_vals_1 = (2 * math.pi * time_vals) / period_1
-        theta_vals_2 = (2 * math.pi * time_vals) / period_2
-        self._anim_data_1 = CalcFunctions.orbital_vals_2d(theta_vals_1, self._planet_1, self._solar_system)
-        self._anim_data_2 = CalcFunctions.orbital_vals_2d(theta_vals_2, self._planet_2, self._solar_system)
+    def resampling_job(self, view: tuple) -> Callable[[], list]:
+        samples = self.orbit_samples()
+        return lambda: [OrbitPaths.display_path(orbit_samples, view, False) for orbit_samples in samples]
+
+    def apply_resampled(self, view: tuple, orbits: list):
+        if self.ani is None:
+            return
+        for orbit, path in zip((self._orbit_1, self._orbit_2), orbits):
+            orbit.set_data(path[:, 0], path[:, 1])
+        self.redraw_background()
+
+    def redraw_background(self):
+        # The orbits are drawn into the blitting background, which the animation saves for each view of the axes. A
+        # resize event makes it discard the saved background, and the full redraw that follows saves a new one
+        canvas = self._fig.canvas
+        canvas.callbacks.process("resize_event", ResizeEvent("resize_event", canvas))
+        canvas.draw()
+
+    def reset_line_cache(self):
+        """
+        Creates an empty offscreen canvas matching the current pixel size and limits of the axes
+        :return: None
+        """
+        xlim, ylim, width, height = self._cache_view = PathResampler.axes_view(self._ax)
+        dpi = self._fig.dpi
+        self._cache_fig = Figure(figsize=(max(width, 1) / dpi, max(height, 1) / dpi), dpi=dpi)
+        self._cache_fig.patch.set_alpha(0)
+        FigureCanvasAgg(self._cache_fig)
+        self._cache_ax = self._cache_fig.add_axes((0, 0, 1, 1))
+        self._cache_ax.set_axis_off()
+        self._cache_ax.set_xlim(xlim)
+        self._cache_ax.set_ylim(ylim)
+        self._cache_lines = LineCollection([], lw=SpiroAnimation.LINE_WIDTH, color="black")
+        self._cache_ax.add_collection(self._cache_lines, autolim=False)
+        self._cache_fig.canvas.draw()
+        self._num_cached = 0
+        self._line_image.set_extent((xlim[0], xlim[1], ylim[0], ylim[1]))
+        self._line_image.set_data(np.zeros((1, 1, 4)))
+
+    def cache_lines(self, end: int):
+        # Draws lines that have not been cached yet on top of the offscreen canvas without clearing it
+        self._cache_lines.set_segments([self._segment_buffer[self._num_cached:end].reshape(-1, 2)])
+        self._cache_ax.draw_artist(self._cache_lines)
+        self._line_image.set_data(np.asarray(self._cache_fig.canvas.buffer_rgba()))
+        self._num_cached = end
+
+    def reset_rasteriser(self):
+        xlim, ylim, width, height = self._cache_view = PathResampler.axes_view(self._ax)
+        self._rasteriser = LineRasteriser(width, height, xlim, ylim)
+        # Black lines whose opacity is the tone mapped coverage, so the orbits in the background stay visible
+        self._raster_rgba = np.zeros((self._rasteriser.height, self._rasteriser.width, 4))
+        self._num_rasterised = 0
+        self._line_image.set_extent((xlim[0], xlim[1], ylim[0], ylim[1]))
+        self._line_image.set_data(self._raster_rgba)
+
+    def rasterise_lines(self, end: int):
+        self._rasteriser.add_segments(self._spiro_data[self._num_rasterised:end])
+        self._raster_rgba[..., 3] = self._rasteriser.tone_map(self._tone_mapping)
+        self._line_image.set_data(self._raster_rgba)
+        self._num_rasterised = end
+
+    def export_png(self, path: str, scale: float = 4):
+        """
+        Rasterises the whole spirograph at a multiple of the on-screen resolution and saves it as a PNG
+        :param path: path of the image file
+        :param scale: resolution of the image relative to the axes on screen
+        :return: None
+        """
+        xlim, ylim, width, height = PathResampler.axes_view(self._ax)
+        rasteriser = LineRasteriser(round(width * scale), round(height * scale), xlim, ylim)
+        rasteriser.add_segments(self._spiro_data)
+        imsave(path, rasteriser.tone_map(self._tone_mapping), cmap="Greys", vmin=0, vmax=1)
 
     def init_func(self):
-        self._lines = [self._ax.plot([], [], lw=0.15, color="black")[0] for _ in range(self._num_lines)]
-        return self._lines + [self._anim_1, self._anim_2, self._orbit_1, self._orbit_2]
+        if self._render_mode == "raster":
+            self.reset_rasteriser()
+            return [self._line_image, self._anim_1, self._anim_2]
+        self.reset_line_cache()
+        self._spiro_lines.set_segments([])
+        # The orbits are not returned, so that they are drawn once into the blitting background
+        return [self._line_image, self._spiro_lines, self._anim_1, self._anim_2]
 
     def animate(self, i):
-        self._anim_1.set_data([self._anim_data_1[0][i]], [self._anim_data_1[1][i]])
-        self._anim_2.set_data([self._anim_data_2[0][i]], [self._anim_data_2[1][i]])
-        self._lines[i].set_data(self._spiro_data[i][0], self._spiro_data[i][1])
+        # Index of the last line drawn by this frame
+        j = min((i + 1) * self._lines_per_frame, self._num_lines) - 1
+        # Once the pattern has closed, the planets keep moving over the lines that have already been drawn
+        k = j % self._num_generated
+        end = min(j + 1, self._num_generated)
+        self._anim_1.set_data(self._anim_data_1[k, 0:1], self._anim_data_1[k, 1:2])
+        self._anim_2.set_data(self._anim_data_2[k, 0:1], self._anim_data_2[k, 1:2])
+        if self._render_mode == "raster":
+            if end < self._num_rasterised or PathResampler.axes_view(self._ax) != self._cache_view:
+                self.reset_rasteriser()
+            if end > self._num_rasterised:
+                self.rasterise_lines(end)
+            artists = [self._line_image, self._anim_1, self._anim_2]
+        else:
+            # The animation has restarted or the axes have been zoomed or resized, so the cached lines are redrawn
+            if end < self._num_cached or PathResampler.axes_view(self._ax) != self._cache_view:
+                self.reset_line_cache()
+            if end - self._num_cached > SpiroAnimation.LINE_CACHE_CHUNK:
+                self.cache_lines(end - SpiroAnimation.LINE_CACHE_CHUNK)
+            # Lines that have not been cached are drawn as one path over a view of the buffer, so no per-line
+            # artists or copies are made
+            self._spiro_lines.set_segments([self._segment_buffer[self._num_cached:end].reshape(-1, 2)])
+            artists = [self._line_image, self._spiro_lines, self._anim_1, self._anim_2]
         if self.post_draw_callback:
-            self.post_draw_callback(i // SpiroAnimation.LINES_PER_ORBIT, i)
-        return self._lines + [self._anim_1, self._anim_2, self._orbit_1, self._orbit_2]
+            self.post_draw_callback(j // SpiroAnimation.LINES_PER_ORBIT, j)
+        return artists
 
     def create_animation(self):
+        self._line_image = self._ax.imshow(np.zeros((1, 1, 4)), origin="upper", aspect="auto", interpolation="nearest",
+                                           extent=(*self._ax.get_xlim(), *self._ax.get_ylim()))
+        self._spiro_lines = LineCollection([], lw=SpiroAnimation.LINE_WIDTH, color="black")
+        self._ax.add_collection(self._spiro_lines, autolim=False)
         self._ax.legend(loc="upper right")
-        self.ani = FuncAnimation(self._fig, self.animate, frames=self._num_lines, interval=self._time_diff, repeat=True, blit=True, init_func=self.init_func)
+        self.ani = FuncAnimation(self._fig, self.animate, frames=self._num_frames, interval=self._time_diff, repeat=True, blit=True, init_func=self.init_func)
 
 if __name__ == "__main__":
     SpiroAnimation("TAU_CETI", "g", "h", 8, 700, 0.5)
\ No newline at end of file
@@ -0,0 +1,73 @@
+import numpy as np
+from backend.constants import Constants
+
+#
+# Layout of one row of a compiled orbital element table. The Decimal enums in the star system modules stay the
+# source of truth, every element is converted to float64 exactly once when its system is compiled
+#
+ORBITAL_ELEMENT_DTYPE = np.dtype([
+    ("mass", np.float64),
+    ("eccentricity", np.float64),
+    ("semi_major_axis", np.float64),
+    ("semi_minor_axis", np.float64),
+    ("orbital_period", np.float64),
+    ("inclination_angle", np.float64),
+])
+
+#
+# Enum class of each star system module holding the values of each field
+#
+ELEMENT_ENUMS: dict[str, str] = {
+    "mass": "Mass",
+    "eccentricity": "Eccentricity",
+    "semi_major_axis": "SemiMajorAxis",
+    "semi_minor_axis": "SemiMinorAxis",
+    "orbital_period": "OrbitalPeriod",
+    "inclination_angle": "InclinationAngle",
+}
+
+
+class CompiledSystem:
+    def __init__(self, solar_system: str):
+        constants = Constants.__dict__[solar_system]
+        self.solar_system = solar_system
+        self.sun: str = constants.SUN
+
+        # Enum keys of every body, in the order of the rows of the table
+        self.bodies: list[str] = [planet.name for planet in constants.Planet]
+        self.index: dict[str, int] = {body: i for i, body in enumerate(self.bodies)}
+
+        self.table = np.zeros(len(self.bodies), dtype=ORBITAL_ELEMENT_DTYPE)
+        for field, enum_name in ELEMENT_ENUMS.items():
+            enum_class = getattr(constants, enum_name)
+            self.table[field] = [float(enum_class[body].value) for body in self.bodies]
+
+    def indices(self, bodies: list[str]) -> np.ndarray:
+        return np.array([self.index[body] for body in bodies], dtype=np.intp)
+
+    def elements(self, bodies: list[str]) -> np.ndarray:
+        """
+        Retrieves the rows of the given bodies
+        :param bodies: enum keys of the bodies
+        :return: structured array of ORBITAL_ELEMENT_DTYPE, ordered as in bodies
+        """
+        return self.table[self.indices(bodies)]
+
+    def field(self, field: str, bodies: list[str]) -> np.ndarray:
+        return np.ascontiguousarray(self.table[field][self.indices(bodies)])
+
+    def value(self, field: str, body: str) -> float:
+        return float(self.table[field][self.index[body]])
+
+
+class SystemRegistry:
+    # Star system enum key -> compiled table, each system is compiled on first use
+    _SYSTEMS: dict[str, CompiledSystem] = {}
+
+    @staticmethod
+    def get(solar_system: str) -> CompiledSystem:
+        compiled = SystemRegistry._SYSTEMS.get(solar_system)
+        if compiled is None:
+            compiled = CompiledSystem(solar_system)
+            SystemRegistry._SYSTEMS[solar_system] = compiled
+        return compiled
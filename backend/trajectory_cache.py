@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+class TrajectoryCache:
+    # Default memory budget of a cache in bytes
+    DEFAULT_MAX_BYTES: int = 256 * 1024 * 1024
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+
+        # Key -> dictionary of trajectory arrays, ordered from least to most recently used
+        self._entries: OrderedDict[tuple, dict[str, np.ndarray]] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        # Animations may calculate their trajectories on worker threads while the GUI thread uses the cache
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(solar_system: str, planets: list[str], centre: str, orbit_duration: float, num_orbits: int,
+                 view_type: str, precision: str = "float64", time_model: str = "uniform") -> tuple:
+        """
+        Builds the key of a set of trajectories from every setting the trajectories depend on
+        :return: hashable key
+        """
+        return (solar_system, tuple(planets), centre, float(orbit_duration), int(num_orbits), view_type, precision,
+                time_model)
+
+    @staticmethod
+    def entry_size(data: dict[str, np.ndarray]) -> int:
+        return sum(array.nbytes for array in data.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: tuple):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: tuple) -> Optional[dict[str, np.ndarray]]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: tuple, data: dict[str, np.ndarray]):
+        """
+        Stores trajectories, evicting the least recently used ones until the cache fits in its memory budget.
+        Arrays are made read-only as they are shared by every animation that uses them
+        :param key: key from make_key
+        :param data: dictionary of trajectory arrays
+        :return: None
+        """
+        size = TrajectoryCache.entry_size(data)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= TrajectoryCache.entry_size(self._entries.pop(key))
+            if size > self.max_bytes:
+                return
+            for array in data.values():
+                array.setflags(write=False)
+            self._entries[key] = data
+            self.nbytes += size
+            self.evict()
+
+    def evict(self):
+        with self._lock:
+            while self.nbytes > self.max_bytes and self._entries:
+                _, data = self._entries.popitem(last=False)
+                self.nbytes -= TrajectoryCache.entry_size(data)
+
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self.evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+#
+# Cache shared by every animation unless another one is given
+#
+TRAJECTORY_CACHE = TrajectoryCache()
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class TrajectoryStore:
+    # Number of samples of every body calculated and written to disk at once
+    CHUNK_SIZE: int = 65536
+    # Trajectories smaller than this many bytes are kept in memory rather than on disk
+    DEFAULT_MIN_BYTES: int = 64 * 1024 * 1024
+    # Default disk budget of a store in bytes, the least recently used trajectories are deleted beyond this
+    DEFAULT_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    DEFAULT_DIRECTORY: str = os.path.join(tempfile.gettempdir(), "bpho_trajectories")
+    # Version of the layout of stored trajectories, part of the name of every entry so that entries written in an
+    # earlier layout are never found. Raised whenever the arrays an animation stores change
+    FORMAT_VERSION: int = 3
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, min_bytes: int = DEFAULT_MIN_BYTES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key_name(key: tuple) -> str:
+        return hashlib.sha1(repr((TrajectoryStore.FORMAT_VERSION, key)).encode()).hexdigest()
+
+    def path(self, key: tuple) -> str:
+        return os.path.join(self.directory, TrajectoryStore.key_name(key))
+
+    def __contains__(self, key: tuple):
+        return os.path.isdir(self.path(key))
+
+    def load(self, key: tuple, shapes: dict[str, tuple], dtype=np.float64) -> Optional[dict[str, np.ndarray]]:
+        """
+        Opens stored trajectories as read-only memory maps, so frames are read from disk only when they are used.
+        Stored trajectories that do not hold exactly the expected arrays, for instance because they were truncated,
+        are deleted and treated as not stored
+        :param key: key from TrajectoryCache.make_key
+        :param shapes: name -> shape of every array expected
+        :param dtype: data type of the arrays expected
+        :return: dictionary of trajectory arrays, or None if the trajectories are not stored
+        """
+        path = self.path(key)
+        if not os.path.isdir(path):
+            return None
+        data = {}
+        try:
+            for name, shape in shapes.items():
+                array = np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+                if array.shape != tuple(shape) or array.dtype != np.dtype(dtype):
+                    raise ValueError(f"stored {name} does not match the expected shape or data type")
+                data[name] = array
+        except (OSError, ValueError):
+            data.clear()
+            self.remove(key)
+            return None
+        # The modification time of an entry records when it was last used, for eviction
+        os.utime(path)
+        return data
+
+    def save(self, key: tuple, shapes: dict[str, tuple], fill: Callable[[dict[str, np.ndarray]], None],
+             dtype=np.float64) -> dict[str, np.ndarray]:
+        """
+        Creates a .npy file for every trajectory array and lets fill write them chunk by chunk through writable
+        memory maps, so no array has to fit in memory. Files are written to a temporary directory that is only
+        renamed into place once fill returns, so an interrupted run never leaves incomplete trajectories behind
+        :param key: key from TrajectoryCache.make_key
+        :param shapes: name -> shape of every array
+        :param fill: function that calculates and writes the contents of the arrays
+        :param dtype: data type of the arrays
+        :return: the stored arrays, opened as in load
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = tempfile.mkdtemp(prefix=".partial-", dir=self.directory)
+        try:
+            arrays = {name: np.lib.format.open_memmap(os.path.join(temp_path, name + ".npy"), mode="w+",
+                                                      dtype=dtype, shape=shape)
+                      for name, shape in shapes.items()}
+            fill(arrays)
+            for array in arrays.values():
+                array.flush()
+            del arrays
+            os.replace(temp_path, self.path(key))
+        except OSError:
+            # Another run stored the same trajectories first
+            if key not in self:
+                raise
+        finally:
+            shutil.rmtree(temp_path, ignore_errors=True)
+        self.evict(keep=TrajectoryStore.key_name(key))
+        return self.load(key, shapes, dtype)
+
+    @staticmethod
+    def entry_size(path: str) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Deletes the least recently used trajectories until the store fits in its disk budget
+        :param keep: name of an entry that is never deleted, such as the one just stored
+        :return: None
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.is_dir() and not entry.name.startswith(".")]
+        except OSError:
+            return
+        sizes = {entry.path: TrajectoryStore.entry_size(entry.path) for entry in entries}
+        total = sum(sizes.values())
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            if entry.name != keep:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                total -= sizes[entry.path]
+
+    def set_max_bytes(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def remove(self, key: tuple):
+        shutil.rmtree(self.path(key), ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+#
+# Store shared by every animation unless another one is given
+#
+TRAJECTORY_STORE = TrajectoryStore()
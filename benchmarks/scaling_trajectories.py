@@ -0,0 +1,75 @@
+"""
+Scaling benchmark of trajectory generation: times the calculation of the frames in a single process against the
+process pool backend with increasing numbers of workers, on a long run of every body of the Solar System, and checks
+that every run produces the same trajectories. The orbital paths are sampled before the timing starts, as they are
+sampled once and shared by every animation.
+
+Usage: python benchmarks/scaling_trajectories.py [--orbits 400] [--time-model kepler] [--max-workers 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+import matplotlib
+
+# The animation modules select the TkAgg backend when they are imported, which cannot start without a display, so the
+# benchmark keeps the Agg backend and ignores that selection
+matplotlib.use("Agg")
+matplotlib.use = lambda *args, **kwargs: None
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend._2d_animation import Animation2D
+from backend._3d_animation import Animation3D
+from backend.parallel_trajectories import ParallelTrajectories
+
+PLANETS = ["MERCURY", "VENUS", "EARTH", "MARS", "JUPITER", "SATURN", "URANUS", "NEPTUNE", "PLUTO"]
+
+
+def generate(animation_class, orbits: int, time_model: str, parallel) -> tuple[float, np.ndarray]:
+    # The animation is built untimed, which also samples its orbital paths once, so only the calculation of the
+    # frames is timed
+    anim = animation_class(None, "SOLAR_SYSTEM", PLANETS, "EARTH", 10, orbits, cache=None, store=None,
+                           time_model=time_model, parallel=parallel)
+    arrays = {name: np.empty(shape, dtype=anim._dtype) for name, shape in anim.trajectory_shapes().items()}
+    start = time.perf_counter()
+    anim.fill_trajectories(arrays)
+    elapsed = time.perf_counter() - start
+    anim.dispose()
+    return elapsed, arrays["frame_data"]
+
+
+def run(orbits: int, time_model: str, max_workers: int, repeats: int) -> bool:
+    consistent = True
+    worker_counts = [n for n in (2, 4, 8, 16, 32) if n <= max_workers] or [2]
+    print(f"{os.cpu_count()} cores, {orbits} orbits, time model {time_model}")
+    for animation_class in (Animation2D, Animation3D):
+        serial_time, serial = min((generate(animation_class, orbits, time_model, None) for _ in range(repeats)),
+                                  key=lambda result: result[0])
+        samples = serial.shape[0] * serial.shape[1]
+        print(f"{animation_class.__name__}: {samples} frame samples, single process {serial_time * 1000:.0f} ms")
+        for num_workers in worker_counts:
+            parallel = ParallelTrajectories(max_workers=num_workers, min_work=0)
+            # The first run starts the workers, which is not part of the steady state
+            generate(animation_class, orbits, time_model, parallel)
+            parallel_time, frame_data = min((generate(animation_class, orbits, time_model, parallel)
+                                       for _ in range(repeats)), key=lambda result: result[0])
+            parallel.shutdown()
+            same = np.array_equal(serial, frame_data)
+            consistent = consistent and same
+            print(f"  {num_workers} workers {parallel_time * 1000:.0f} ms, speed-up {serial_time / parallel_time:.2f}x"
+                  f"{'' if same else ', DIFFERENT RESULTS'}")
+    return consistent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orbits", type=int, default=400, help="orbits of the outermost planet")
+    parser.add_argument("--time-model", default="kepler", choices=("uniform", "kepler", "table"))
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeats", type=int, default=3)
+    options = parser.parse_args()
+    sys.exit(0 if run(options.orbits, options.time_model, options.max_workers, options.repeats) else 1)
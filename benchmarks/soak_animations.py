@@ -0,0 +1,98 @@
+"""
+Headless memory soak benchmark: rebuilds the orbit and spirograph animations on one reused figure thousands of times,
+as the pages do when settings change, and fails if the resident memory keeps growing after a warm-up.
+
+Usage: python benchmarks/soak_animations.py [--iterations 3000] [--max-growth-mb 40]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import matplotlib
+
+# The animation modules select the TkAgg backend when they are imported, which cannot start without a display, so the
+# benchmark keeps the Agg backend and ignores that selection
+matplotlib.use("Agg")
+matplotlib.use = lambda *args, **kwargs: None
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend._2d_animation import Animation2D
+from backend._3d_animation import Animation3D
+from backend.spiro_animation import SpiroAnimation
+
+#
+# Configurations cycled through, as a kiosk would cycle through settings
+#
+CONFIGURATIONS = [
+    (Animation2D, ("SOLAR_SYSTEM", ["MERCURY", "VENUS", "EARTH", "MARS"], "SUN", 5, 2)),
+    (Animation3D, ("SOLAR_SYSTEM", ["JUPITER", "SATURN", "URANUS", "NEPTUNE", "PLUTO"], "SUN", 5, 1)),
+    (Animation2D, ("TAU_CETI", ["g", "h", "e", "f"], "e", 2, 2)),
+    (SpiroAnimation, ("SOLAR_SYSTEM", "VENUS", "EARTH", 10, "fast")),
+    (Animation3D, ("HD_219134", ["b", "c", "f", "d"], "HD_219134", 3, 3)),
+    (SpiroAnimation, ("SOLAR_SYSTEM", "EARTH", "MARS", 20, "fast")),
+]
+
+
+def resident_memory() -> int:
+    """
+    Resident set size of the process in bytes, or the memory traced by tracemalloc where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return tracemalloc.get_traced_memory()[0]
+
+
+def run(iterations: int, max_growth_mb: float, frames_per_animation: int) -> bool:
+    if not os.path.exists("/proc/self/statm"):
+        tracemalloc.start()
+    fig = Figure(figsize=(6, 6), dpi=50)
+    FigureCanvasAgg(fig)
+    warm_up = max(iterations // 10, len(CONFIGURATIONS))
+    baseline = None
+    peak = 0
+    anim = None
+    start = time.perf_counter()
+    for i in range(iterations):
+        animation_class, args = CONFIGURATIONS[i % len(CONFIGURATIONS)]
+        if anim is not None:
+            anim.dispose()
+        fig.clear()
+        anim = animation_class(fig, *args)
+        for frame in range(frames_per_animation):
+            anim.animate(frame)
+        if i == warm_up:
+            gc.collect()
+            baseline = resident_memory()
+        elif baseline is not None:
+            peak = max(peak, resident_memory())
+        if (i + 1) % 500 == 0:
+            print(f"{i + 1} animations, {resident_memory() / 2 ** 20:.1f} MB, "
+                  f"{(time.perf_counter() - start) / (i + 1) * 1000:.1f} ms per animation")
+    anim.dispose()
+    fig.clear()
+    gc.collect()
+    growth = (max(peak, resident_memory()) - baseline) / 2 ** 20
+    print(f"memory after warm-up {baseline / 2 ** 20:.1f} MB, growth {growth:.1f} MB "
+          f"over {iterations - warm_up} animations (limit {max_growth_mb} MB)")
+    return growth <= max_growth_mb
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=3000)
+    parser.add_argument("--max-growth-mb", type=float, default=40)
+    parser.add_argument("--frames", type=int, default=5, help="frames drawn by each animation")
+    options = parser.parse_args()
+    bounded = run(options.iterations, options.max_growth_mb, options.frames)
+    if not bounded:
+        print("FAILED: memory grew beyond the limit")
+    sys.exit(0 if bounded else 1)
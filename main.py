@@ -2,6 +2,7 @@ from typing import Callable
 
 from PyQt6 import QtWidgets, QtGui, QtCore
 from ui.pages import OrbitsPage, SpirographPage, OrbitsPageSettings, PageClasses, PageIndexes
+import multiprocessing
 import sys
 
 
@@ -32,19 +33,33 @@ class MainWindow(QtWidgets.QMainWindow):
             tab_widget.setTabToolTip(i, tooltip)
             tab_widget.setTabVisible(i, is_visible)
 
+    def closeEvent(self, event: QtGui.QCloseEvent):
+        # Stops every animation and releases the figures before the window closes, then waits for cancelled
+        # calculations to stop
+        for i in range(self.central_widget.count()):
+            page = self.central_widget.widget(i)
+            if hasattr(page, "teardown"):
+                page.teardown()
+        QtCore.QThreadPool.globalInstance().waitForDone()
+        super().closeEvent(event)
+
     def switch_to(self, widget_index: int, post_func: Callable = None):
         self.central_widget.setCurrentIndex(widget_index)
         if post_func:
             post_func(self.central_widget.currentWidget())
 
 
-app = QtWidgets.QApplication(sys.argv)
-app_icon = QtGui.QIcon("appicon.ico")
-app_icon.addFile('icons/16x16.png', QtCore.QSize(16,16))
-app_icon.addFile('icons/24x24.png', QtCore.QSize(24,24))
-app_icon.addFile('icons/32x32.png', QtCore.QSize(32,32))
-app_icon.addFile('icons/48x48.png', QtCore.QSize(48,48))
-app_icon.addFile('icons/256x256.png', QtCore.QSize(256,256))
-app.setWindowIcon(QtGui.QIcon("appicon.ico"))
-w = MainWindow()
-app.exec()
+if __name__ == "__main__":
+    # Worker processes of the parallel trajectory backend are spawned, and import this module as __mp_main__ without
+    # starting the application
+    multiprocessing.freeze_support()
+    app = QtWidgets.QApplication(sys.argv)
+    app_icon = QtGui.QIcon("appicon.ico")
+    app_icon.addFile('icons/16x16.png', QtCore.QSize(16,16))
+    app_icon.addFile('icons/24x24.png', QtCore.QSize(24,24))
+    app_icon.addFile('icons/32x32.png', QtCore.QSize(32,32))
+    app_icon.addFile('icons/48x48.png', QtCore.QSize(48,48))
+    app_icon.addFile('icons/256x256.png', QtCore.QSize(256,256))
+    app.setWindowIcon(QtGui.QIcon("appicon.ico"))
+    w = MainWindow()
+    app.exec()
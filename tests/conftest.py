@@ -0,0 +1,11 @@
+import os
+import sys
+
+import matplotlib
+
+# The animation modules select the TkAgg backend when they are imported, which cannot start without a display, so the
+# tests keep the Agg backend and ignore that selection
+matplotlib.use("Agg")
+matplotlib.use = lambda *args, **kwargs: None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
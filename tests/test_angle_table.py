@@ -0,0 +1,33 @@
+import math
+
+import numpy as np
+import pytest
+
+from backend.angle_table import AngleTable
+from backend.calc_functions import CalcFunctions
+
+
+@pytest.mark.parametrize("eccentricity", [0.0, 0.017, 0.21, 0.25, 0.6, 0.9])
+def test_table_follows_kepler_model(eccentricity):
+    # Times in orbits, covering several orbits and points between the entries of the table
+    orbits = np.linspace(0, 3, 200_001)
+    uniform_angles = 2 * math.pi * orbits[np.newaxis]
+    kepler = CalcFunctions.kepler_angles(uniform_angles, [eccentricity])[0]
+    table = CalcFunctions.table_angles(uniform_angles, [eccentricity])[0]
+    assert np.abs(table - kepler).max() <= AngleTable.DEFAULT_TOLERANCE
+
+
+def test_table_respects_a_looser_tolerance():
+    orbits = np.linspace(0, 1, 100_001)
+    kepler = CalcFunctions.kepler_angles(2 * math.pi * orbits[np.newaxis], [0.5])[0]
+    table = AngleTable.get(0.5, 1e-3)
+    assert table.size < AngleTable.get(0.5).size
+    assert np.abs(table.angles_at(orbits) - kepler).max() <= 1e-3
+
+
+def test_tables_are_shared_per_eccentricity_and_tolerance():
+    table = AngleTable.get(0.3)
+    assert AngleTable.get(np.float64(0.3)) is table
+    assert AngleTable.get(0.3, AngleTable.DEFAULT_TOLERANCE) is table
+    assert AngleTable.get(0.3, 1e-4) is not table
+    assert AngleTable.get(0.31) is not table
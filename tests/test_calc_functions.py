@@ -0,0 +1,112 @@
+import math
+
+import numpy as np
+import pytest
+
+from backend.calc_functions import CalcFunctions
+from backend.system_registry import SystemRegistry
+
+
+@pytest.mark.parametrize("eccentricity", [0.0, 0.3, 0.9, 0.99])
+def test_eccentric_anomaly_solves_keplers_equation(eccentricity):
+    mean_anomaly = np.linspace(-20, 20, 10001)
+    ecc_anomaly = CalcFunctions.eccentric_anomaly(mean_anomaly, eccentricity)
+    residual = ecc_anomaly - eccentricity * np.sin(ecc_anomaly) - mean_anomaly
+    assert np.abs(residual).max() < 1e-10
+    # The solution stays on the revolution of the mean anomaly
+    assert np.all(np.diff(ecc_anomaly) > 0)
+
+
+def test_kepler_model_without_eccentricity_is_uniform():
+    time_vals = np.linspace(0, 30, 2001)
+    periods = np.array([0.24, 1.0, 11.86])
+    uniform = CalcFunctions.orbital_angles(time_vals, periods)
+    kepler = CalcFunctions.orbital_angles(time_vals, periods, np.zeros(3), "kepler")
+    np.testing.assert_allclose(kepler, uniform, rtol=0, atol=1e-12)
+
+
+def test_kepler_angles_are_vectorised_over_bodies_and_times():
+    time_vals = np.linspace(0, 5, 301)
+    periods = np.array([0.24, 1.0, 1.88, 0.0])
+    eccentricity = np.array([0.21, 0.017, 0.9, 0.0])
+    theta_vals = CalcFunctions.orbital_angles(time_vals, periods, eccentricity, "kepler")
+    assert theta_vals.shape == (4, 301)
+    for i in range(4):
+        single = CalcFunctions.orbital_angles(time_vals, periods[i:i + 1], eccentricity[i:i + 1], "kepler")[0]
+        np.testing.assert_allclose(theta_vals[i], single, rtol=0, atol=1e-12)
+    # The star does not move
+    assert np.all(theta_vals[3] == 0)
+
+
+def test_kepler_angles_sweep_equal_areas():
+    # The mean anomaly recovered from the true anomaly grows uniformly with time, which is Kepler's second law
+    e = 0.9
+    time_vals = np.linspace(0, 3, 601)
+    theta_vals = CalcFunctions.orbital_angles(time_vals, [1.0], [e], "kepler")[0]
+    # Angles are measured from aphelion, so the true anomaly is the angle plus pi
+    true_anomaly = theta_vals + math.pi
+    ecc_anomaly = 2 * np.arctan(np.sqrt((1 - e) / (1 + e)) * np.tan(true_anomaly / 2))
+    mean_anomaly = np.unwrap(ecc_anomaly - e * np.sin(ecc_anomaly))
+    expected = 2 * math.pi * time_vals
+    np.testing.assert_allclose(mean_anomaly - mean_anomaly[0], expected - expected[0], atol=1e-9)
+
+
+def test_repeat_period_of_commensurate_periods():
+    assert CalcFunctions.repeat_period([1.0, 2.0, 3.0]) == pytest.approx(6.0)
+    assert CalcFunctions.repeat_period([0.0, 1.5]) == pytest.approx(1.5)
+    assert CalcFunctions.repeat_period([0.0]) is None
+
+
+def test_exact_repeat_rejects_non_commensurate_periods():
+    # Venus and Earth almost line up every 8 years, but drift by far more than the tolerance over a long run
+    periods = [0.615, 1.0]
+    distances = [0.728, 1.017]
+    assert CalcFunctions.repeat_period(periods) == pytest.approx(8.0, rel=0.01)
+    assert CalcFunctions.exact_repeat(periods, distances, 100.0, 1e-5) is None
+    assert CalcFunctions.exact_repeat([2 ** 0.5, 1.0], distances, 1000.0, 1e-5) is None
+    # Commensurate periods repeat exactly, and a repeat longer than half the span is never used
+    assert CalcFunctions.exact_repeat([0.5, 1.0], distances, 100.0, 1e-5) == pytest.approx(1.0)
+    assert CalcFunctions.exact_repeat([0.5, 1.0], distances, 1.5, 1e-5) is None
+
+
+def sampled_positions(solar_system: str, bodies: list[str], dims: int) -> np.ndarray:
+    # Positions of the bodies around the star over many orbits of the slowest, with uniform and Kepler timing
+    elements = SystemRegistry.get(solar_system).elements(bodies)
+    time_vals = np.linspace(0, 3 * elements["orbital_period"].max(), 200_001)
+    inclination = elements["inclination_angle"] if dims == 3 else None
+    return np.concatenate([CalcFunctions.orbital_positions(
+        CalcFunctions.orbital_angles(time_vals, elements["orbital_period"], elements["eccentricity"], time_model),
+        elements["semi_minor_axis"], elements["eccentricity"], inclination) for time_model in ("uniform", "kepler")],
+        axis=1)
+
+
+@pytest.mark.parametrize("dims", [2, 3])
+@pytest.mark.parametrize("solar_system, bodies", [("SOLAR_SYSTEM", ["MERCURY", "EARTH", "PLUTO"]),
+                                                  ("HD_219134", ["b", "c", "d"])])
+def test_orbit_bounds_are_the_smallest_box(solar_system, bodies, dims):
+    elements = SystemRegistry.get(solar_system).elements(bodies)
+    inclination = elements["inclination_angle"] if dims == 3 else None
+    lower, upper = CalcFunctions.orbit_bounds(elements["semi_minor_axis"], elements["eccentricity"], inclination)
+    positions = sampled_positions(solar_system, bodies, dims)
+    extent = float(np.ptp(positions))
+    assert np.all(positions.min(axis=1) >= lower - 1e-12 * extent)
+    assert np.all(positions.max(axis=1) <= upper + 1e-12 * extent)
+    np.testing.assert_allclose(positions.min(axis=1), lower, atol=1e-6 * extent)
+    np.testing.assert_allclose(positions.max(axis=1), upper, atol=1e-6 * extent)
+
+
+@pytest.mark.parametrize("dims", [2, 3])
+@pytest.mark.parametrize("bodies", [["MERCURY", "VENUS", "MARS", "EARTH"], ["EARTH", "PLUTO", "JUPITER"],
+                                    ["EARTH", "SUN"]])
+def test_relative_bounds_enclose_every_position(bodies, dims):
+    elements = SystemRegistry.get("SOLAR_SYSTEM").elements(bodies)
+    inclination = elements["inclination_angle"] if dims == 3 else None
+    lower, upper = CalcFunctions.relative_bounds(elements["semi_minor_axis"], elements["eccentricity"], inclination)
+    positions = sampled_positions("SOLAR_SYSTEM", bodies, dims)
+    relative = (positions[:-1] - positions[-1]).reshape(-1, dims)
+    assert np.all(relative.min(axis=0) >= lower - 1e-12)
+    assert np.all(relative.max(axis=0) <= upper + 1e-12)
+    if bodies[-1] == "SUN":
+        # Around the star the box is exact
+        np.testing.assert_allclose(relative.min(axis=0), lower, atol=1e-6)
+        np.testing.assert_allclose(relative.max(axis=0), upper, atol=1e-6)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from backend.line_rasteriser import LineRasteriser
+
+
+def rasteriser() -> LineRasteriser:
+    # 100 x 50 pixels over [0, 10] x [0, 5], so one data unit is 10 pixels
+    return LineRasteriser(100, 50, (0, 10), (0, 5))
+
+
+@pytest.mark.parametrize("end", [(9.0, 1.3), (1.3, 4.6), (8.7, 4.1)])
+def test_coverage_adds_up_to_the_length_in_pixels(end):
+    raster = rasteriser()
+    start = np.array([1.05, 0.85])
+    raster.add_segments(np.array([[start, end]]))
+    length = 10 * np.hypot(*(np.array(end) - start))
+    assert raster.buffer.sum() == pytest.approx(length, rel=0.02)
+    # A pixel gets at most the length of line crossing one column or row of pixels, which is sqrt(2) on a diagonal
+    assert raster.buffer.max() <= np.sqrt(2)
+    # Every sample is split between the two nearest pixels across the line, so the line stays two pixels wide
+    assert np.count_nonzero(raster.buffer) <= 2 * (np.ceil(np.abs(np.subtract(end, start)).max() * 10) + 1)
+
+
+def test_batches_give_the_same_coverage(monkeypatch):
+    rng = np.random.default_rng(1)
+    segments = rng.uniform((0, 0), (10, 5), size=(200, 2, 2))
+    whole = rasteriser()
+    whole.add_segments(segments)
+    monkeypatch.setattr(LineRasteriser, "MAX_SAMPLES_PER_BATCH", 500)
+    batched = rasteriser()
+    batched.add_segments(segments)
+    np.testing.assert_allclose(batched.buffer, whole.buffer, rtol=1e-12, atol=1e-12)
+
+
+def test_coverage_outside_the_image_is_dropped():
+    raster = rasteriser()
+    raster.add_segments(np.array([[(-5.0, 2.5), (15.0, 2.5)]]))
+    # Only the part of the line inside the image is kept, with rows of pixels either side of it
+    assert raster.buffer.sum() == pytest.approx(100, rel=0.02)
+    raster.clear()
+    assert not raster.buffer.any()
+
+
+def test_tone_maps():
+    raster = rasteriser()
+    assert not raster.tone_map("log").any()
+    raster.buffer[0, :4] = [0, 1, 10, 100]
+    density = raster.tone_map("density", exposure=10)
+    np.testing.assert_allclose(density[0, :4], [0, 0.1, 1, 1])
+    log = raster.tone_map("log")
+    # The peak maps to full intensity, sparse coverage stays visible and the order of densities is kept
+    assert log[0, 3] == pytest.approx(1)
+    assert 0 < log[0, 1] < log[0, 2] < log[0, 3]
+    assert log[0, 1] > density[0, 1] / 10
+    assert log.min() == 0 and log.max() <= 1
+    with pytest.raises(ValueError):
+        raster.tone_map("linear")
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from backend.orbit_paths import OrbitPaths
+
+
+@pytest.fixture
+def small_memo(monkeypatch):
+    monkeypatch.setattr(OrbitPaths, "_PATHS", type(OrbitPaths._PATHS)())
+    monkeypatch.setattr(OrbitPaths, "_nbytes", 0)
+    monkeypatch.setattr(OrbitPaths, "MAX_BYTES", 1000)
+
+
+def test_memo_evicts_least_recently_used(small_memo):
+    for name in "abc":
+        OrbitPaths.remember((name,), name, 400)
+    # Only two entries fit, so the first one was dropped
+    assert OrbitPaths.recall(("a",)) is None
+    assert OrbitPaths.recall(("b",)) == "b"
+    OrbitPaths.remember(("d",), "d", 400)
+    # "b" was used after "c", so "c" is dropped instead
+    assert OrbitPaths.recall(("c",)) is None
+    assert OrbitPaths.recall(("b",)) == "b"
+    assert OrbitPaths._nbytes == 800
+    OrbitPaths.remember(("e",), "e", 2000)
+    assert OrbitPaths.recall(("e",)) is None
+    assert OrbitPaths._nbytes == 800
+
+
+def test_view_points_count_against_budget(small_memo, monkeypatch):
+    monkeypatch.setattr(OrbitPaths, "MAX_BYTES", 64 * 1024 * 1024)
+    samples = OrbitPaths.relative_samples("SOLAR_SYSTEM", "MARS", "EARTH", 10, "uniform", 2)
+    key, _, params, path, _ = samples
+    # A view zoomed in far enough for the path to be resampled
+    view = ((-0.01, 0.01), (-0.01, 0.01), 800, 600)
+    points = OrbitPaths.display_path(samples, view)
+    assert OrbitPaths.display_path(samples, view) is points
+    assert not points.flags.writeable
+    assert OrbitPaths._nbytes == params.nbytes + path.nbytes + points.nbytes
+    # Dropping the budget below the samples keeps only the most recently used entry
+    OrbitPaths.set_max_bytes(points.nbytes)
+    assert OrbitPaths.recall(key) is None
+    assert OrbitPaths._nbytes == points.nbytes
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_spawned_workers_fill_trajectories(tmp_path):
+    # The script runs from a file behind a __main__ guard, as main.py does, since spawned workers import the main
+    # module of the parent. Spawned workers share the resource tracker of the parent, so they must leave the shared
+    # memory blocks to it
+    script = tmp_path / "fill.py"
+    script.write_text(textwrap.dedent(f"""
+        import sys
+        import tempfile
+        sys.path.insert(0, {ROOT!r})
+        import matplotlib
+        matplotlib.use("Agg")
+        matplotlib.use = lambda *args, **kwargs: None
+        import numpy as np
+        import backend.parallel_trajectories
+        from backend._2d_animation import Animation2D
+        from backend.parallel_trajectories import ParallelTrajectories
+        from backend.trajectory_store import TrajectoryStore
+
+        if __name__ == "__main__":
+            # State set in the parent is not seen by the workers, which start in a fresh interpreter
+            backend.parallel_trajectories.PARENT_ONLY = True
+            parallel = ParallelTrajectories(max_workers=2, min_work=0)
+            inherited = parallel.executor().submit(eval, "getattr(__import__('backend.parallel_trajectories')"
+                                                         ".parallel_trajectories, 'PARENT_ONLY', None)")
+            assert inherited.result() is None
+            store = TrajectoryStore(tempfile.mkdtemp(), min_bytes=0)
+            args = (None, "SOLAR_SYSTEM", ["VENUS", "EARTH", "MARS"], "SUN", 5, 4)
+            stored = Animation2D(*args, cache=None, store=store, parallel=parallel)
+            shared = Animation2D(*args, cache=None, store=None, parallel=parallel)
+            serial = Animation2D(*args, cache=None, store=None, parallel=None)
+            assert np.array_equal(stored._frame_data, serial._frame_data)
+            assert np.array_equal(shared._frame_data, serial._frame_data)
+            parallel.shutdown()
+    """))
+    result = subprocess.run([sys.executable, str(script)], cwd=tmp_path, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    assert "resource_tracker" not in result.stderr
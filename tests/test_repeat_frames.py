@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from backend._2d_animation import Animation2D
+from backend._3d_animation import Animation3D
+
+
+@pytest.mark.parametrize("animation_class", [Animation2D, Animation3D])
+@pytest.mark.parametrize("time_model", ["uniform", "kepler"])
+def test_reused_frames_match_direct_calculation(animation_class, time_model):
+    anim = animation_class(None, "SOLAR_SYSTEM", ["EARTH"], "SUN", 5, 10, cache=None, store=None, parallel=None,
+                           time_model=time_model)
+    # Only the first orbit is calculated and served for every later one
+    assert anim._cycle_frames < anim._num_frames
+    for i in list(range(0, anim._num_frames, 97)) + [anim._cycle_frames, anim._num_frames - 1]:
+        frame = anim.get_frame_stats(i)
+        state = anim.state_at(frame["time"])
+        np.testing.assert_allclose(frame["coordinates"], state["coordinates"], rtol=0, atol=1e-9)
+        for name in ("star_distance", "linear_velocity", "angular_velocity", "centre_distance"):
+            np.testing.assert_allclose(frame[name], state[name], rtol=1e-9)
+    anim.dispose()
+
+
+@pytest.mark.parametrize("animation_class", [Animation2D, Animation3D])
+def test_non_repeating_motion_is_calculated_in_full(animation_class):
+    anim = animation_class(None, "SOLAR_SYSTEM", ["VENUS"], "EARTH", 5, 10, cache=None, store=None, parallel=None)
+    assert anim._cycle_frames == anim._num_frames
+    last = anim._num_frames - 1
+    np.testing.assert_allclose(anim.get_frame_stats(last)["coordinates"],
+                               anim.state_at(anim.time_at(last))["coordinates"], rtol=0, atol=1e-9)
+    anim.dispose()
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from backend.calc_functions import CalcFunctions
+from backend.spiro_animation import SpiroAnimation
+from backend.system_registry import SystemRegistry
+
+
+def all_lines(anim: SpiroAnimation, solar_system: str, planet_1: str, planet_2: str) -> np.ndarray:
+    # Every line of the whole animation on the time grid of the animation, calculated directly
+    elements = SystemRegistry.get(solar_system).elements([planet_1, planet_2])
+    span = float(elements["orbital_period"].max()) * anim._num_orbits
+    time_vals = np.arange(round(span / anim._time_step) + 1) * anim._time_step
+    positions = CalcFunctions.orbital_vals_batch(time_vals, elements["semi_minor_axis"], elements["eccentricity"],
+                                                 elements["orbital_period"])
+    return positions.transpose(1, 0, 2)
+
+
+@pytest.mark.parametrize("solar_system, planet_1, planet_2, N", [("SOLAR_SYSTEM", "VENUS", "URANUS", 100),
+                                                                 ("SOLAR_SYSTEM", "MERCURY", "PLUTO", 10),
+                                                                 ("HD_219134", "b", "f", 100)])
+def test_capped_lines_cover_every_line(solar_system, planet_1, planet_2, N):
+    capped = SpiroAnimation(None, solar_system, planet_1, planet_2, N, "fast", closure="cap")
+    assert capped._num_lines < N * SpiroAnimation.LINES_PER_ORBIT
+    lines = all_lines(capped, solar_system, planet_1, planet_2)
+    extent = float(np.ptp(lines))
+    # Every line of the whole animation retraces a line of the first repeat, to within the closure tolerance
+    repeats = capped._spiro_data[np.arange(len(lines)) % capped._num_lines]
+    assert np.abs(lines - repeats).max() <= SpiroAnimation.CLOSURE_TOLERANCE * extent
+    full = SpiroAnimation(None, solar_system, planet_1, planet_2, N, "fast", closure="off")
+    assert full._num_lines == N * SpiroAnimation.LINES_PER_ORBIT
+
+
+@pytest.mark.parametrize("planet_1, planet_2, N", [("VENUS", "EARTH", 100), ("EARTH", "PLUTO", 10),
+                                                   ("JUPITER", "SATURN", 10)])
+def test_inexact_repeats_are_not_capped(planet_1, planet_2, N):
+    capped = SpiroAnimation(None, "SOLAR_SYSTEM", planet_1, planet_2, N, "fast", closure="cap")
+    full = SpiroAnimation(None, "SOLAR_SYSTEM", planet_1, planet_2, N, "fast", closure="off")
+    assert capped._num_lines == full._num_lines == N * SpiroAnimation.LINES_PER_ORBIT
+    np.testing.assert_array_equal(capped._spiro_data, full._spiro_data)
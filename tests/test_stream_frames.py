@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from backend._2d_animation import Animation2D
+from backend._3d_animation import Animation3D
+
+
+def stream_animation(animation_class, render_mode: str):
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    # Ten orbits give 1250 frames, which span three chunks of frames
+    return animation_class(fig, "SOLAR_SYSTEM", ["MERCURY", "VENUS"], "EARTH", 5, 10, render_mode=render_mode,
+                           cache=None, store=None, frame_mode="stream", parallel=None)
+
+
+def drawn_positions(anim, render_mode: str) -> np.ndarray:
+    if render_mode == "collection":
+        positions = np.asarray(anim._bodies.get_offsets())
+        if isinstance(anim, Animation3D):
+            positions = np.column_stack((positions, anim._bodies._offsets3d[2]))
+        return positions
+    return np.array([np.concatenate([np.atleast_1d(values)[:1] for values in marker.get_data_3d()])
+                     if isinstance(anim, Animation3D) else np.ravel(marker.get_xydata()[0])
+                     for marker in anim._anims])
+
+
+@pytest.mark.parametrize("animation_class", [Animation2D, Animation3D])
+@pytest.mark.parametrize("render_mode", ["collection", "lines"])
+def test_frames_across_chunk_boundaries(animation_class, render_mode):
+    anim = stream_animation(animation_class, render_mode)
+    chunk = animation_class.STREAM_CHUNK
+    assert anim._num_frames > 2 * chunk
+    for i in range(chunk - 2, 2 * chunk + 2):
+        anim.animate(i)
+        expected = anim.state_at(anim.time_at(i))["coordinates"]
+        np.testing.assert_allclose(drawn_positions(anim, render_mode), expected, atol=1e-12)
+    anim.dispose()
+
+
+@pytest.mark.parametrize("animation_class", [Animation2D, Animation3D])
+def test_seek_after_update_settings(animation_class):
+    anim = stream_animation(animation_class, "collection")
+    anim.animate(100)
+    anim.update_settings(["MERCURY"], 5, 10)
+    anim.seek(anim.time_at(1100))
+    anim.animate(1100)
+    expected = anim.state_at(anim.time_at(1100))["coordinates"]
+    np.testing.assert_allclose(drawn_positions(anim, "collection"), expected, atol=1e-12)
+    anim.dispose()
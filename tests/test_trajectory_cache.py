@@ -0,0 +1,46 @@
+import numpy as np
+
+from backend.trajectory_cache import TrajectoryCache
+
+
+def entry(num_bytes: int) -> dict[str, np.ndarray]:
+    return {"frame_data": np.zeros(num_bytes // 8)}
+
+
+def test_least_recently_used_entries_are_evicted_by_bytes():
+    cache = TrajectoryCache(max_bytes=2500)
+    for key in ("a", "b"):
+        cache.put((key,), entry(1000))
+    # Using "a" makes "b" the least recently used entry
+    assert cache.get(("a",)) is not None
+    cache.put(("c",), entry(1000))
+    assert ("b",) not in cache
+    assert ("a",) in cache and ("c",) in cache
+    assert cache.nbytes == 2000
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_entries_are_read_only_and_oversized_ones_are_not_kept():
+    cache = TrajectoryCache(max_bytes=2500)
+    data = entry(1000)
+    cache.put(("a",), data)
+    assert not data["frame_data"].flags.writeable
+    cache.put(("b",), entry(4000))
+    assert ("b",) not in cache
+    assert cache.get(("b",)) is None and cache.misses == 1
+
+
+def test_lowering_the_budget_evicts():
+    cache = TrajectoryCache(max_bytes=4000)
+    for key in ("a", "b", "c"):
+        cache.put((key,), entry(1000))
+    cache.set_max_bytes(1500)
+    assert len(cache) == 1 and ("c",) in cache
+    assert cache.nbytes == 1000
+
+
+def test_key_covers_every_setting():
+    key = TrajectoryCache.make_key("SOLAR_SYSTEM", ["EARTH"], "SUN", 5, 3, "2D")
+    assert key != TrajectoryCache.make_key("SOLAR_SYSTEM", ["EARTH"], "SUN", 5, 3, "2D", time_model="kepler")
+    assert key != TrajectoryCache.make_key("SOLAR_SYSTEM", ["EARTH"], "SUN", 5, 3, "2D", precision="float32")
+    assert key == TrajectoryCache.make_key("SOLAR_SYSTEM", ["EARTH"], "SUN", 5.0, 3, "2D")
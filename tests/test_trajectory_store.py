@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+
+from backend.trajectory_store import TrajectoryStore
+
+SHAPES = {"frame_data": (750, 4, 8)}
+
+
+def fill(arrays):
+    for array in arrays.values():
+        array[...] = 1
+
+
+def test_mismatched_entry_is_deleted(tmp_path):
+    store = TrajectoryStore(str(tmp_path))
+    key = ("SOLAR_SYSTEM", ("EARTH",), "SUN")
+    os.makedirs(store.path(key))
+    np.save(os.path.join(store.path(key), "frame_data.npy"), np.zeros((3, 2, 8)))
+    assert store.load(key, SHAPES) is None
+    assert key not in store
+    assert store.load(key, SHAPES, np.float32) is None
+
+
+def test_stored_entry_is_loaded(tmp_path):
+    store = TrajectoryStore(str(tmp_path))
+    key = ("SOLAR_SYSTEM", ("EARTH",), "SUN")
+    data = store.save(key, SHAPES, fill)
+    assert data["frame_data"].shape == SHAPES["frame_data"]
+    assert store.load(key, SHAPES)["frame_data"][0, 0, 0] == 1
+    # An entry read with another data type is not served
+    assert store.load(key, SHAPES, np.float32) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    entry_bytes = 750 * 4 * 8 * 8
+    store = TrajectoryStore(str(tmp_path), max_bytes=int(2.5 * entry_bytes))
+    keys = [("SOLAR_SYSTEM", (planet,), "SUN") for planet in ("MERCURY", "VENUS", "EARTH")]
+    for i, key in enumerate(keys[:2]):
+        store.save(key, SHAPES, fill)
+        os.utime(store.path(key), (i, i))
+    # Loading the first entry makes the second the least recently used
+    store.load(keys[0], SHAPES)
+    store.save(keys[2], SHAPES, fill)
+    assert keys[0] in store
+    assert keys[1] not in store
+    assert keys[2] in store
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from backend._2d_animation import Animation2D
+from backend._3d_animation import Animation3D
+from backend.trajectory_cache import TrajectoryCache
+
+
+def animation(animation_class, cache: TrajectoryCache):
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    return animation_class(fig, "SOLAR_SYSTEM", ["MERCURY", "VENUS", "MARS"], "EARTH", 5, 2, cache=cache,
+                           store=None, parallel=None)
+
+
+@pytest.mark.parametrize("animation_class", [Animation2D, Animation3D])
+def test_classify_settings(animation_class):
+    cache = TrajectoryCache()
+    anim = animation(animation_class, cache)
+    state = (list(anim._planets), anim._orbit_duration, anim._num_frames, anim._frame_data)
+    assert anim.classify_settings(["MERCURY", "MARS"], 5, 2) == "removed"
+    assert anim.classify_settings(["MERCURY", "VENUS", "MARS"], 20, 2) == "calculate"
+    assert anim.classify_settings(["MERCURY", "VENUS", "MARS"], 5, 3) == "calculate"
+    assert anim.classify_settings(["MERCURY", "VENUS", "MARS", "JUPITER"], 5, 2) == "calculate"
+    # Removing the outermost planet changes the time base
+    assert anim.classify_settings(["MERCURY", "VENUS"], 5, 2) == "calculate"
+    animation_class(None, "SOLAR_SYSTEM", ["MERCURY", "VENUS"], "EARTH", 5, 2, cache=cache, store=None,
+                    parallel=None)
+    assert anim.classify_settings(["MERCURY", "VENUS"], 5, 2) == "cached"
+    # Classifying leaves the animation unchanged
+    assert state == (anim._planets, anim._orbit_duration, anim._num_frames, anim._frame_data)
+    anim.dispose()
+
+
+@pytest.mark.parametrize("animation_class", [Animation2D, Animation3D])
+def test_removed_planets_keep_frames(animation_class):
+    anim = animation(animation_class, None)
+    anim.update_settings(["MARS", "MERCURY"], 5, 2)
+    fresh = animation_class(None, "SOLAR_SYSTEM", ["MARS", "MERCURY"], "EARTH", 5, 2, cache=None, store=None,
+                            parallel=None)
+    np.testing.assert_array_equal(anim._frame_data, fresh._frame_data)
+    anim.dispose()
@@ -1,3 +1,4 @@
+import threading
 from typing import Callable, Optional
 
 from PyQt6 import QtCore, QtGui, QtWidgets
@@ -6,6 +7,7 @@ from backend.tau_ceti_constants import TauCeti
 from backend.proxima_centauri_constants import ProximaCentauri
 from backend.solar_system_constants import SolarSystem
 from backend.HD_219134_constants import HD219134
+from backend.calc_functions import CalculationCancelled
 
 
 #
@@ -318,4 +320,125 @@ class ValueViewer(QtWidgets.QVBoxLayout):
             self.setContentsMargins(*padding)
 
     def set_text(self, new_text: str):
-        self.label.setText(str(new_text) if new_text else "-")
+        new_text = str(new_text) if new_text else "-"
+        # Setting the text of a label triggers a relayout, so it is skipped when the text has not changed
+        if new_text != self.label.text():
+            self.label.setText(new_text)
+
+
+#
+# Calls a refresh function at its own fixed rate with the most recently submitted arguments.
+# Submissions made between two refreshes are coalesced so that only the latest one is used, which lets the animation
+# timer submit every frame without ever waiting on label layout
+#
+class RefreshScheduler(QtCore.QObject):
+    def __init__(self, refresh: Callable, rate: float, parent: Optional[QtCore.QObject] = None):
+        super().__init__(parent)
+        self._refresh = refresh
+        self._pending: Optional[tuple] = None
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self._on_timeout)
+        self.set_rate(rate)
+        self.timer.start()
+
+    def set_rate(self, rate: float):
+        """
+        Sets how often the refresh function is called
+        :param rate: refreshes per second
+        :return: None
+        """
+        self.timer.setInterval(max(1, round(1000 / rate)))
+
+    def submit(self, *args):
+        self._pending = args
+
+    def clear(self):
+        self._pending = None
+
+    def _on_timeout(self):
+        if self._pending is None:
+            return
+        args, self._pending = self._pending, None
+        self._refresh(*args)
+
+
+#
+# Slider over the whole duration of an animation with a readout of the current time.
+# Moving the slider calls on_seek with the time picked, and the slider follows the animation through set_time
+# except while it is being dragged
+#
+class TimelineSlider(QtWidgets.QHBoxLayout):
+    # Number of positions of the slider between the start and the end of the animation
+    STEPS: int = 1000
+
+    def __init__(self, on_seek: Callable, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_seek = on_seek
+        self.total_time = 1.0
+        self.slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
+        self.slider.setRange(0, TimelineSlider.STEPS)
+        self.slider.valueChanged.connect(self._on_value_changed)
+        self.addWidget(self.slider)
+        self.label = QtWidgets.QLabel()
+        self.label.setFixedWidth(150)
+        self.addWidget(self.label)
+        self.set_time(0)
+
+    def set_total_time(self, total_time: float):
+        self.total_time = max(total_time, 1e-12)
+        self.set_time(0)
+
+    def set_time(self, time: float):
+        self.label.setText(f"t = {time:.3f} years")
+        if self.slider.isSliderDown():
+            return
+        self.slider.blockSignals(True)
+        self.slider.setValue(round(time / self.total_time * TimelineSlider.STEPS))
+        self.slider.blockSignals(False)
+
+    def _on_value_changed(self, value: int):
+        time = value / TimelineSlider.STEPS * self.total_time
+        self.label.setText(f"t = {time:.3f} years")
+        self.on_seek(time)
+
+
+#
+# Signals through which a calculation worker hands its progress and result to the GUI thread
+#
+class CalculationSignals(QtCore.QObject):
+    progress = QtCore.pyqtSignal(float)
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+
+
+#
+# Runs a calculation on a thread of the global thread pool, so that the window stays responsive while it runs.
+# The calculation is called with a progress callback and a cancel event, and its progress and result are emitted as
+# signals, which are received on the GUI thread. Once cancelled, the calculation stops at its next progress report and
+# emits nothing more
+#
+class CalculationWorker(QtCore.QRunnable):
+    def __init__(self, calculate: Callable):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.calculate = calculate
+        self.signals = CalculationSignals()
+        self.cancel_event = threading.Event()
+
+    def start(self):
+        QtCore.QThreadPool.globalInstance().start(self)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            result = self.calculate(self.signals.progress.emit, self.cancel_event)
+        except CalculationCancelled:
+            return
+        except Exception as error:
+            if not self.cancel_event.is_set():
+                self.signals.failed.emit(str(error))
+            return
+        if not self.cancel_event.is_set():
+            self.signals.finished.emit(result)
@@ -2,16 +2,18 @@ from typing import Optional
 from PyQt6 import QtCore, QtGui, QtWidgets
 from enum import Enum
 
-from _decimal import Decimal
+import numpy as np
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-from math import cos, sqrt, pi
 
 from backend._2d_animation import Animation2D
 from backend._3d_animation import Animation3D
+from backend.calc_functions import CalcFunctions
+from backend.system_registry import SystemRegistry
 from ui.components import OrbitSimSettings, ViewTypePicker, SettingsKeys, ViewType, SettingsBtnLayout, \
-    HorizontalValuePicker, ValueViewer, VerticalValuePicker, StarSystem, solar_system_enum_to_class
+    HorizontalValuePicker, ValueViewer, VerticalValuePicker, StarSystem, solar_system_enum_to_class, RefreshScheduler, \
+    TimelineSlider, CalculationWorker
 import matplotlib
 
 from backend.spiro_animation import SpiroAnimation
@@ -45,6 +47,10 @@ class OrbitsPage(QtWidgets.QWidget):
         "Orbital period": None,
         "Inclination angle": None,
     }
+    #
+    # Number of times per second the orbit statistics are refreshed, independently of the animation frame rate
+    #
+    STATS_REFRESH_RATE: float = 8
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -64,12 +70,37 @@ class OrbitsPage(QtWidgets.QWidget):
         self.toolbar = NavigationToolbar(self.canvas, self)
         self.graph_layout.addWidget(self.toolbar)
         self.graph_layout.addWidget(self.canvas)
+        #
+        # Creating the timeline used to jump to any point in time of the animation
+        #
+        self.timeline = TimelineSlider(on_seek=self.on_timeline_seek)
+        self.graph_layout.addLayout(self.timeline)
+        #
+        # Creating the progress bar shown while the trajectories of a new animation are calculated
+        #
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.hide()
+        self.graph_layout.addWidget(self.progress_bar)
         settings_btn_layout = SettingsBtnLayout(on_click=self.on_settings_button_click,
                                                 btn_width=30,
                                                 btn_height=30)
         self.graph_layout.addLayout(settings_btn_layout)
         root_layout.addLayout(self.graph_layout)
+        #
+        # The animation only submits the statistics of each frame, the labels are refreshed at their own rate
+        #
+        self.stats_scheduler = RefreshScheduler(self.refresh_stats_labels, OrbitsPage.STATS_REFRESH_RATE, self)
         self.anim = None
+        #
+        # Settings that cannot be changed without creating a new animation: star system, centre and view type
+        #
+        self.anim_layout: Optional[tuple] = None
+        #
+        # Worker calculating the trajectories of the next animation, and the settings it was started with
+        #
+        self.worker: Optional[CalculationWorker] = None
+        self.pending_settings: Optional[tuple] = None
         self.display_animation()
         #
         # Creating layout and widgets for user to pick planet to see orbit stats on
@@ -140,32 +171,119 @@ class OrbitsPage(QtWidgets.QWidget):
         planets = [solar_system_class.Planet(s).name for s in settings[SettingsKeys.OBJECTS_TO_SHOW.value]]
         orbit_duration = int(settings[SettingsKeys.ORBIT_TIME.value])
         num_orbits = int(settings[SettingsKeys.NUM_ORBITS.value])
+        view_type = settings[SettingsKeys.VIEW_TYPE.value]
+        anim_layout = (solar_system.name, centre, view_type)
+        #
+        # Cancels the calculation of an animation that has not finished, as its settings are out of date
+        #
+        self.cancel_calculation()
+        if self.anim and anim_layout == self.anim_layout and \
+                self.anim.classify_settings(planets, orbit_duration, num_orbits) != "calculate":
+            #
+            # Planets were only removed or the trajectories are cached, so no frames need calculating and the
+            # animation applies the settings in place straight away
+            #
+            self.stats_scheduler.clear()
+            self.anim.update_settings(planets, orbit_duration, num_orbits)
+            self.timeline.set_total_time(self.anim.total_time())
+            return
         #
-        # Deletes the old canvas and toolbar and creates new ones
-        #
-        if self.anim:
-            self.anim.ani.event_source.stop()
-        self.graph_layout.removeWidget(self.canvas)
-        self.graph_layout.removeWidget(self.toolbar)
-        self.fig = Figure(figsize=(10, 10))
-        self.canvas = FigureCanvas(self.fig)
-        self.toolbar = NavigationToolbar(self.canvas, self)
-        self.graph_layout.insertWidget(0, self.toolbar)
-        self.graph_layout.insertWidget(1, self.canvas)
+        # Calculates the trajectories on a worker thread so that the window stays responsive meanwhile
+        #
+        animation_class = Animation2D if view_type == ViewType.TWO_D.value else Animation3D
+        args = [None, solar_system.name, planets, centre, orbit_duration, num_orbits, self.stats_scheduler.submit]
+        self.worker = CalculationWorker(lambda progress_callback, cancel_event: animation_class(
+            *args, progress_callback=progress_callback, cancel_event=cancel_event))
+        self.pending_settings = (anim_layout, planets, orbit_duration, num_orbits)
+        self.worker.signals.progress.connect(self.on_calculation_progress)
+        self.worker.signals.finished.connect(self.on_calculation_finished)
+        self.worker.signals.failed.connect(self.on_calculation_failed)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.worker.start()
+
+    def cancel_calculation(self):
+        if self.worker:
+            self.worker.cancel()
+            self.worker = None
+            self.progress_bar.hide()
+
+    def is_current_worker(self) -> bool:
+        # Signals queued by a worker before it was cancelled may still arrive, and are ignored
+        return self.worker is not None and self.sender() is self.worker.signals
+
+    def on_calculation_progress(self, fraction: float):
+        if self.is_current_worker():
+            self.progress_bar.setValue(round(fraction * 100))
+
+    def on_calculation_failed(self, message: str):
+        if not self.is_current_worker():
+            return
+        self.worker = None
+        self.progress_bar.hide()
+        QtWidgets.QMessageBox.warning(self, "Orbits", f"The animation could not be calculated: {message}")
+
+    def on_calculation_finished(self, calculated_anim):
+        """
+        Shows the animation calculated by the worker, called on the GUI thread once its trajectories are ready
+        :param calculated_anim: animation created without a figure
+        :return: None
+        """
+        if not self.is_current_worker():
+            return
+        self.worker = None
+        self.progress_bar.hide()
+        anim_layout, planets, orbit_duration, num_orbits = self.pending_settings
+        self.stats_scheduler.clear()
+        if self.anim and anim_layout == self.anim_layout:
+            #
+            # Only the planets shown, orbit time or number of orbits changed, which the animation applies in place,
+            # taking the trajectories the worker calculated
+            #
+            self.anim.update_settings(planets, orbit_duration, num_orbits, calculated_anim)
+            calculated_anim.dispose()
+            self.timeline.set_total_time(self.anim.total_time())
+            return
         #
-        # Initialises the new animation from arguments
+        # Stops the old animation and clears the figure, keeping the canvas and toolbar, then draws the new animation
         #
-        args = [self.fig, solar_system.name, planets, centre, orbit_duration, num_orbits, self.refresh_stats_labels]
-        animation_class = Animation2D if settings[SettingsKeys.VIEW_TYPE.value] == ViewType.TWO_D.value else Animation3D
-        self.anim = animation_class(*args)
+        if self.anim:
+            self.anim.dispose()
+        self.fig.clear()
+        self.toolbar.update()
+        self.anim = calculated_anim
+        self.anim.attach(self.fig)
+        self.anim_layout = anim_layout
+        self.timeline.set_total_time(self.anim.total_time())
+        self.canvas.draw_idle()
+
+    def teardown(self):
+        """
+        Disposes of the animation and closes the canvas, called when the window closes
+        :return: None
+        """
+        self.cancel_calculation()
+        self.stats_scheduler.timer.stop()
+        self.stats_scheduler.clear()
+        if self.anim:
+            self.anim.dispose()
+            self.anim = None
+        self.fig.clear()
+        self.canvas.close()
 
-    def refresh_stats_labels(self, theta_angles: list[float], coords: list[list[float]]):
+    def on_timeline_seek(self, time: float):
+        if self.anim:
+            self.anim.seek(time)
+
+    def refresh_stats_labels(self, frame_stats: dict[str, np.ndarray]):
         """
-        Refreshes the contents of the statistics labels. This function is called after every frame
-        :param theta_angles: the current orbital angles of all the planets in the animation
-        :param coords: the coordinates of all the planets in the animation
+        Refreshes the contents of the statistics labels. This function is called by the stats scheduler with the
+        statistics of the latest frame drawn
+        :param frame_stats: the coordinates and precomputed orbit statistics of all the planets in the animation
+        at the current frame, see Animation2D.get_frame_stats
         :return: None, labels are modified in-place
         """
+        self.timeline.set_time(frame_stats["time"])
         #
         # Calculates which star system and planet to show statistics on
         #
@@ -182,53 +300,31 @@ class OrbitsPage(QtWidgets.QWidget):
         except ValueError:
             # star system is being actively changed in settings, and so refreshing is paused until everything is synced
             return
+        coords = frame_stats["coordinates"]
+        if i >= len(coords):
+            # objects to show are being changed, and so refreshing is paused until the new animation is displayed
+            return
         #
-        # Retrieves key constants from the relevant constant enum classes
-        #
-        star_enum_key = solar_system_class.SUN
-        earth_mass = Decimal('5.972') * Decimal(Decimal('10') ** Decimal('24'))
-        au_in_metres = Decimal('1.496') * Decimal(Decimal('10') ** Decimal('11'))
-        G: Decimal = Decimal('6.67') * Decimal(Decimal('10') ** Decimal('-11'))
-        M: Decimal = solar_system_class.Mass[star_enum_key].value * earth_mass
-        e: Decimal = solar_system_class.Eccentricity[planet_enum_key].value
-        b: Decimal = solar_system_class.SemiMinorAxis[planet_enum_key].value * au_in_metres
-        a: Decimal = solar_system_class.SemiMajorAxis[planet_enum_key].value * au_in_metres
-        m: Decimal = solar_system_class.Mass[planet_enum_key].value * earth_mass
-        P: Decimal = solar_system_class.OrbitalPeriod[planet_enum_key].value
-        beta: Decimal = solar_system_class.InclinationAngle[planet_enum_key].value
-        #
-        # Retrieves orbital angle and coordinates from the data received from the animation class
-        #
-        theta: float = theta_angles[i] % float(Decimal('2') * Decimal(pi))
-        coords: list[float] = coords[i]
-        #
-        # Calculates orbital radius, linear velocity and angular velocity (relative to the star), using these constants
+        # Retrieves key constants from the compiled orbital element table
         #
-        r = b / (Decimal('1') - e * Decimal(cos(theta)))
-        if a == 0:
-            v = 0
-        else:
-            v = sqrt(G * M * (Decimal('2') / r - Decimal('1') / a))
-        if r == 0:
-            w = 0
-        else:
-            w = Decimal(v) / r
+        elements = SystemRegistry.get(solar_system.name).elements([planet_enum_key])[0]
+        m = float(elements["mass"]) * CalcFunctions.EARTH_MASS
         #
-        # Rounds these values, adds units and sets text of the relevant labels to these new statistics
+        # Rounds the precomputed values of the current frame, adds units and sets text of the relevant labels
         #
         OrbitsPage.ORBITS_STATS = {
-            "Coordinates": ",\n".join([str(round(coord, 6)) + " a.u." for coord in coords]),
-            "Mass": f"{round(float(m), 6)} kg",
-            "Angular velocity": f"{round(w, 10)} m/s",
-            "Linear velocity": f"{round(v, 6)} m/s",
-            "Distance from centre": f"{round(sqrt(sum(n * n for n in coords)), 6)} a.u.",
-            "Distance from star": f"{round(float(r / au_in_metres), 6)} a.u.",
-            "Orbital angle": f"{round(theta, 6)} rad",
-            "Eccentricity": e,
-            "Semi-major axis": f"{round(a / au_in_metres, 6)} a.u.",
-            "Semi-minor axis": f"{round(b / au_in_metres, 6)} a.u.",
-            "Orbital period": f"{round(float(P), 6)} years",
-            "Inclination angle": f"{round(float(beta), 6)} rad"
+            "Coordinates": ",\n".join([str(round(coord, 6)) + " a.u." for coord in coords[i].tolist()]),
+            "Mass": f"{round(m, 6)} kg",
+            "Angular velocity": f"{round(float(frame_stats['angular_velocity'][i]), 10)} m/s",
+            "Linear velocity": f"{round(float(frame_stats['linear_velocity'][i]), 6)} m/s",
+            "Distance from centre": f"{round(float(frame_stats['centre_distance'][i]), 6)} a.u.",
+            "Distance from star": f"{round(float(frame_stats['star_distance'][i]), 6)} a.u.",
+            "Orbital angle": f"{round(float(frame_stats['orbital_angle'][i]), 6)} rad",
+            "Eccentricity": float(elements["eccentricity"]),
+            "Semi-major axis": f"{float(elements['semi_major_axis']):.6f} a.u.",
+            "Semi-minor axis": f"{float(elements['semi_minor_axis']):.6f} a.u.",
+            "Orbital period": f"{round(float(elements['orbital_period']), 6)} years",
+            "Inclination angle": f"{round(float(elements['inclination_angle']), 6)} rad"
         }
 
         for i, k in enumerate(OrbitsPage.ORBITS_STATS.keys()):
@@ -436,7 +532,23 @@ class SpirographPage(QtWidgets.QWidget):
         self.toolbar = NavigationToolbar(self.canvas, self)
         self.graph_layout.addWidget(self.toolbar)
         self.graph_layout.addWidget(self.canvas)
+        #
+        # Progress bar shown while the lines of a new spirograph are calculated
+        #
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.hide()
+        self.graph_layout.addWidget(self.progress_bar)
         self.anim = None
+        #
+        # Settings that cannot be changed without creating a new animation, everything but the speed
+        #
+        self.anim_layout: Optional[tuple] = None
+        #
+        # Worker calculating the lines of the next spirograph, and the settings it was started with
+        #
+        self.worker: Optional[CalculationWorker] = None
+        self.pending_layout: Optional[tuple] = None
         root_layout.addLayout(self.graph_layout)
         controls_layout = QtWidgets.QVBoxLayout()
         controls_layout.addStretch()
@@ -500,6 +612,23 @@ class SpirographPage(QtWidgets.QWidget):
         num_picker_layout.addLayout(self.speed_picker)
         num_picker_layout.addLayout(self.n_orbits)
         param_picker_layout.addLayout(num_picker_layout)
+        render_layout = QtWidgets.QHBoxLayout()
+        self.render_mode_picker: HorizontalValuePicker = HorizontalValuePicker(
+            value_type="from_multiple",
+            lbl_text="Render: ",
+            tooltip="Raster mode accumulates lines into an image, for spirographs with very many lines",
+            choices=list(SpiroAnimation.RENDER_MODES),
+            default_val="vector",
+            fixed_form_width=75,
+            fixed_lbl_width=60,
+            fixed_height=25,
+            padding=[5, 5, 5, 5])
+        render_layout.addLayout(self.render_mode_picker)
+        export_button = QtWidgets.QPushButton("Export PNG")
+        export_button.setToolTip("Saves the whole spirograph as a high resolution image")
+        export_button.pressed.connect(self.on_export_button_press)
+        render_layout.addWidget(export_button)
+        param_picker_layout.addLayout(render_layout)
         controls_layout.addLayout(param_picker_layout)
         controls_layout.addSpacing(20)
         eval_button_layout = QtWidgets.QHBoxLayout()
@@ -519,8 +648,13 @@ class SpirographPage(QtWidgets.QWidget):
                                         fixed_value_height=50,
                                         fixed_width=80,
                                         alignment=QtCore.Qt.AlignmentFlag.AlignTop)
+        self.repeat_period = ValueViewer("Repeats after",
+                                         fixed_value_height=50,
+                                         fixed_width=100,
+                                         alignment=QtCore.Qt.AlignmentFlag.AlignTop)
         values_layout.addLayout(self.completed_orbits)
         values_layout.addLayout(self.elapsed_time)
+        values_layout.addLayout(self.repeat_period)
         values_layout.addStretch()
         values_layout.setAlignment(QtCore.Qt.AlignmentFlag.AlignTop)
         controls_layout.addLayout(values_layout)
@@ -534,6 +668,25 @@ class SpirographPage(QtWidgets.QWidget):
     def on_eval_button_press(self):
         self.display_animation()
 
+    def teardown(self):
+        """
+        Disposes of the animation and closes the canvas, called when the window closes
+        :return: None
+        """
+        self.cancel_calculation()
+        if self.anim:
+            self.anim.dispose()
+            self.anim = None
+        self.fig.clear()
+        self.canvas.close()
+
+    def on_export_button_press(self):
+        if not self.anim:
+            return
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export spirograph", "spirograph.png", "PNG (*.png)")
+        if path:
+            self.anim.export_png(path)
+
     def display_animation(self):
         star_system: StarSystem = StarSystem(self.star_system_picker.get_value())
         star_system_class = solar_system_enum_to_class[star_system]
@@ -541,17 +694,68 @@ class SpirographPage(QtWidgets.QWidget):
         planet2: str = star_system_class.Planet(self.planet2picker.get_value()).name
         speed: str = self.speed_picker.get_value()
         N: int = int(self.n_orbits.get_value())
+        render_mode: str = self.render_mode_picker.get_value()
+        anim_layout = (star_system.name, planet1, planet2, N, render_mode)
+        self.cancel_calculation()
+        if self.anim and anim_layout == self.anim_layout:
+            # Only the speed changed, which only changes the interval between frames
+            self.anim.set_speed(speed)
+            return
+        #
+        # Calculates the lines on a worker thread so that the window stays responsive meanwhile
+        #
+        args = [None, star_system.name, planet1, planet2, N, speed, self.refresh_labels, render_mode]
+        self.worker = CalculationWorker(lambda progress_callback, cancel_event: SpiroAnimation(
+            *args, progress_callback=progress_callback, cancel_event=cancel_event))
+        self.pending_layout = anim_layout
+        self.worker.signals.progress.connect(self.on_calculation_progress)
+        self.worker.signals.finished.connect(self.on_calculation_finished)
+        self.worker.signals.failed.connect(self.on_calculation_failed)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.worker.start()
+
+    def cancel_calculation(self):
+        if self.worker:
+            self.worker.cancel()
+            self.worker = None
+            self.progress_bar.hide()
+
+    def is_current_worker(self) -> bool:
+        # Signals queued by a worker before it was cancelled may still arrive, and are ignored
+        return self.worker is not None and self.sender() is self.worker.signals
+
+    def on_calculation_progress(self, fraction: float):
+        if self.is_current_worker():
+            self.progress_bar.setValue(round(fraction * 100))
+
+    def on_calculation_failed(self, message: str):
+        if not self.is_current_worker():
+            return
+        self.worker = None
+        self.progress_bar.hide()
+        QtWidgets.QMessageBox.warning(self, "Spirograph", f"The spirograph could not be calculated: {message}")
+
+    def on_calculation_finished(self, calculated_anim: SpiroAnimation):
+        if not self.is_current_worker():
+            return
+        self.worker = None
+        self.progress_bar.hide()
+        #
+        # Stops the old animation and clears the figure, keeping the canvas and toolbar, then draws the new animation
+        #
         if self.anim:
-            self.anim.ani.event_source.stop()
-        self.graph_layout.removeWidget(self.canvas)
-        self.graph_layout.removeWidget(self.toolbar)
-        self.fig = Figure(figsize=(10, 10))
-        self.canvas = FigureCanvas(self.fig)
-        self.toolbar = NavigationToolbar(self.canvas, self)
-        self.graph_layout.insertWidget(0, self.toolbar)
-        self.graph_layout.insertWidget(1, self.canvas)
-        args = [self.fig, star_system.name, planet1, planet2, N, speed, self.refresh_labels]
-        self.anim = SpiroAnimation(*args)
+            self.anim.dispose()
+        self.fig.clear()
+        self.toolbar.update()
+        self.anim = calculated_anim
+        self.anim.attach(self.fig)
+        self.anim_layout = self.pending_layout
+        self.canvas.draw_idle()
+        if self.anim.repeat_period is None:
+            self.repeat_period.set_text("-")
+        else:
+            self.repeat_period.set_text(f"{round(self.anim.repeat_period, 3)} years")
 
     def on_star_system_changed(self, new_index: int):
         if new_index < 0: